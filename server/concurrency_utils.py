@@ -0,0 +1,113 @@
+"""
+Concurrency helpers shared by the Python data services
+Bounded fan-out over daemon threads, so a slow upstream call never keeps a
+short-lived CLI process alive after its response has been written
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+_WORKER_DONE = object()
+
+
+def iter_concurrent(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 4,
+                    timeout: Optional[float] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    Run func(item) for every item on at most max_workers daemon threads and
+    yield (item, outcome) pairs in completion order. Items are pulled lazily,
+    so memory stays bounded for long inputs.
+
+    outcome is {"status": "ok" | "error" | "timeout", "latency_ms": ...} plus
+    "value" on success or "error" on failure. Once timeout seconds have passed,
+    every item still in flight or not yet started is yielded as a timeout and
+    abandoned.
+    """
+    source = iter(items)
+    lock = threading.Lock()
+    in_flight = {}
+    results = queue.Queue()
+
+    def worker():
+        while True:
+            with lock:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    break
+                token = object()
+                started = time.monotonic()
+                in_flight[token] = (item, started)
+            try:
+                outcome = {"status": "ok", "value": func(item)}
+            except Exception as e:
+                outcome = {"status": "error", "error": str(e)}
+            outcome["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+            results.put((token, item, outcome))
+        results.put(_WORKER_DONE)
+
+    workers = max(1, max_workers)
+    for _ in range(workers):
+        threading.Thread(target=worker, daemon=True).start()
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    finished_workers = 0
+    while finished_workers < workers:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            break
+        try:
+            message = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if message is _WORKER_DONE:
+            finished_workers += 1
+            continue
+        token, item, outcome = message
+        with lock:
+            in_flight.pop(token, None)
+        yield item, outcome
+    else:
+        return
+
+    # Deadline reached: report everything unfinished and stop handing out work
+    now = time.monotonic()
+    with lock:
+        abandoned = list(in_flight.values())
+        in_flight.clear()
+        unstarted = list(source)
+    for item, started in abandoned:
+        yield item, {"status": "timeout", "latency_ms": round((now - started) * 1000, 1)}
+    for item in unstarted:
+        yield item, {"status": "timeout", "latency_ms": 0.0}
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter: `rate` tokens per second with bursts
+    of up to `capacity`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"TokenBucket rate must be positive, got {rate}")
+        if capacity is not None and capacity <= 0:
+            raise ValueError(f"TokenBucket capacity must be positive, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
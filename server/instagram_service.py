@@ -1,224 +1,725 @@
 #!/usr/bin/env python3
 
 import json
+import queue
+import sqlite3
 import sys
+import threading
+from contextlib import contextmanager
 from instagrapi import Client
-from instagrapi.exceptions import LoginRequired, PleaseWaitFewMinutes, ChallengeRequired
+from instagrapi.exceptions import LoginRequired, PleaseWaitFewMinutes, ChallengeRequired, UserNotFound
 import time
 import os
 from datetime import datetime, timedelta
 
-def get_user_info(username):
-    """Get Instagram user information"""
+from concurrency_utils import TokenBucket, iter_concurrent
+from instagram_store import BackfillCursors, PollCursors, ResponseCache, SeenFilter, UserIdCache
+
+# Session settings (device ids, cookies) persist here so every process looks
+# like the same device instead of a fresh install
+CACHE_DIR = os.environ.get("INSTAGRAM_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+SESSION_PATH = os.environ.get("INSTAGRAM_SESSION_PATH", os.path.join(CACHE_DIR, "instagram_session.json"))
+
+FINANCE_HASHTAGS = ["investing", "stocks", "trading", "crypto", "bitcoin", "ethereum", "finance", "money"]
+
+# Every HTTP request to Instagram in the process draws one token from this
+# bucket; it replaces instagrapi's fixed per-request sleep (request_timeout)
+RATE_LIMITER = TokenBucket(
+    float(os.environ.get("INSTAGRAM_RATE_PER_SEC", "2")),
+    float(os.environ.get("INSTAGRAM_RATE_BURST", str(len(FINANCE_HASHTAGS))))
+)
+CRAWL_WORKERS = int(os.environ.get("INSTAGRAM_CRAWL_WORKERS", "8"))
+CRAWL_TIMEOUT = float(os.environ.get("INSTAGRAM_CRAWL_TIMEOUT", "20"))
+
+# Lookup responses: successes are fresh for RESPONSE_TTL and may be served
+# stale for up to RESPONSE_MAX_STALE while upstream fails; a failure is not
+# retried for NEGATIVE_TTL
+RESPONSE_TTL = float(os.environ.get("INSTAGRAM_CACHE_TTL", "600"))
+RESPONSE_MAX_STALE = float(os.environ.get("INSTAGRAM_CACHE_MAX_STALE", "86400"))
+NEGATIVE_TTL = float(os.environ.get("INSTAGRAM_NEGATIVE_TTL", "120"))
+
+# Incremental polling state and the response cache, opened on first use
+_poll_state = None
+_poll_state_lock = threading.Lock()
+_response_cache = None
+_user_ids = None
+_backfills = None
+BULK_WORKERS = int(os.environ.get("INSTAGRAM_BULK_WORKERS", "8"))
+
+_client = None
+_client_lock = threading.Lock()
+# Idle clones of the shared client for concurrent calls (a Client keeps
+# per-request state on itself, so threads must not share one)
+_client_pool = queue.Queue()
+
+def get_client():
+    """Shared client, created once per process from the persisted session"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+def create_client():
+    """
+    Client restored from SESSION_PATH when present. With INSTAGRAM_USERNAME and
+    INSTAGRAM_PASSWORD set it logs in, reusing the restored session if it is
+    still valid; otherwise public endpoints are used anonymously.
+    """
+    cl = Client()
+    if os.path.exists(SESSION_PATH):
+        try:
+            cl.load_settings(SESSION_PATH)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable Instagram session: {e}", file=sys.stderr)
+    pace_requests(cl)
+    
+    username = os.environ.get("INSTAGRAM_USERNAME")
+    password = os.environ.get("INSTAGRAM_PASSWORD")
+    if username and password:
+        try:
+            cl.login(username, password)
+        except Exception as e:
+            print(f"Warning: Instagram login failed, continuing anonymously: {e}", file=sys.stderr)
+    save_session(cl)
+    return cl
+
+def save_session(cl=None):
+    """Write the client's settings atomically (owner-only, they hold cookies)"""
+    cl = cl or _client
+    if cl is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(SESSION_PATH)), exist_ok=True)
+        tmp_path = f"{SESSION_PATH}.{os.getpid()}.tmp"
+        cl.dump_settings(tmp_path)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, SESSION_PATH)
+    except OSError as e:
+        print(f"Warning: could not persist Instagram session: {e}", file=sys.stderr)
+
+@contextmanager
+def borrow_client():
+    """
+    A client for one thread: an idle clone from the pool, or a new clone that
+    shares the device identity and cookies of the main client
+    """
     try:
+        cl = _client_pool.get_nowait()
+    except queue.Empty:
+        base = get_client()
         cl = Client()
-        # Try to get user info without login for basic public data
-        user_id = cl.user_id_from_username(username)
-        user_info = cl.user_info(user_id)
-        
-        result = {
-            "status": "success",
-            "data": {
-                "user_id": str(user_info.pk),
-                "username": user_info.username,
-                "full_name": user_info.full_name,
-                "biography": user_info.biography,
-                "follower_count": user_info.follower_count,
-                "following_count": user_info.following_count,
-                "media_count": user_info.media_count,
-                "is_verified": user_info.is_verified,
-                "is_private": user_info.is_private,
-                "profile_pic_url": str(user_info.profile_pic_url) if user_info.profile_pic_url else None,
-                "external_url": user_info.external_url
+        cl.set_settings(base.get_settings())
+        pace_requests(cl)
+        cl.username, cl.password = base.username, base.password
+    try:
+        yield cl
+    finally:
+        _client_pool.put(cl)
+
+def pace_requests(cl):
+    """
+    Charge RATE_LIMITER one token per HTTP request the client sends, so a
+    call that pages or resolves ids is paced per request, not per call.
+    instagrapi 2.x has private and public sessions; 3.x adds graphql.
+    """
+    sessions = (getattr(cl, name, None) for name in ("private", "public", "graphql"))
+    for session in filter(None, sessions):
+        def paced_send(request, _send=session.send, **kwargs):
+            RATE_LIMITER.acquire()
+            return _send(request, **kwargs)
+        session.send = paced_send
+    cl.request_timeout = 0
+
+def call_client(func, cl=None):
+    """
+    Run func(client), whose HTTP requests are paced by RATE_LIMITER; an
+    expired login is renewed once and the call retried
+    """
+    cl = cl or get_client()
+    try:
+        return func(cl)
+    except LoginRequired:
+        if not (cl.username and cl.password):
+            raise
+        cl.relogin()
+        save_session(cl)
+        return func(cl)
+
+def get_poll_state():
+    """(cursors, seen filter) shared by all incremental polls in the process"""
+    global _poll_state
+    with _poll_state_lock:
+        if _poll_state is None:
+            _poll_state = (
+                PollCursors(os.path.join(CACHE_DIR, "instagram_poll.sqlite")),
+                SeenFilter(os.path.join(CACHE_DIR, "instagram_seen.bloom"),
+                           capacity=int(os.environ.get("INSTAGRAM_SEEN_CAPACITY", "200000")))
+            )
+        return _poll_state
+
+def get_response_cache():
+    """Shared response cache, or None when disabled (INSTAGRAM_RESPONSE_CACHE=0) or unavailable"""
+    global _response_cache
+    if os.environ.get("INSTAGRAM_RESPONSE_CACHE", "1") == "0":
+        return None
+    with _poll_state_lock:
+        if _response_cache is None:
+            try:
+                _response_cache = ResponseCache(os.path.join(CACHE_DIR, "instagram_responses.sqlite"))
+            except (sqlite3.Error, OSError) as e:
+                print(f"Warning: Instagram response cache disabled: {e}", file=sys.stderr)
+                _response_cache = False
+        return _response_cache or None
+
+def get_user_ids():
+    """Shared username -> pk cache"""
+    global _user_ids
+    with _poll_state_lock:
+        if _user_ids is None:
+            _user_ids = UserIdCache(os.path.join(CACHE_DIR, "instagram_user_ids.sqlite"))
+        return _user_ids
+
+def get_backfill_cursors():
+    """Shared resume points for paginated post backfills"""
+    global _backfills
+    with _poll_state_lock:
+        if _backfills is None:
+            _backfills = BackfillCursors(os.path.join(CACHE_DIR, "instagram_backfill.sqlite"))
+        return _backfills
+
+def resolve_user_id(username, cl=None):
+    """User pk for a username, resolved upstream only the first time"""
+    user_ids = get_user_ids()
+    user_id = user_ids.get(username)
+    if user_id is None:
+        user_id = call_client(lambda c: c.user_id_from_username(username), cl)
+        user_ids.put(username, user_id)
+    return user_id
+
+def poll_new_medias(feed, fetch_page, limit, max_pages=5, cl=None):
+    """
+    Media in a feed that this feed has not emitted yet, newest first.
+    fetch_page(client, page_cursor) returns (medias, next_page_cursor) newest
+    first. Paging runs down to the stored cursor, so a re-poll usually costs
+    one page. At most `limit` media are returned; when the limit or max_pages
+    cuts a poll short, the page to resume from is stored and the next polls
+    work through that backlog before the cursor moves past it. The first poll
+    of a feed only takes its newest `limit` media.
+    """
+    cursors, seen = get_poll_state()
+    state = cursors.get(feed)
+    last_pk = state["last_pk"] if state else None
+    backlog = state is not None and state["resume_cursor"] is not None
+    # A backlog is bounded above by resume_top; a head scan by what it sees
+    top = state["resume_top"] if backlog else None
+    page_cursor = (state["resume_cursor"] or None) if backlog else None
+    
+    new_medias = []
+    taken = set()
+    pages = 0
+    resume_cursor = None
+    complete = False
+    while not complete and resume_cursor is None:
+        if pages == max_pages:
+            if last_pk is None:
+                complete = True
+            else:
+                resume_cursor = page_cursor
+            break
+        fetch_cursor = page_cursor
+        medias, page_cursor = call_client(lambda c: fetch_page(c, fetch_cursor), cl)
+        pages += 1
+        for media in medias:
+            pk = int(media.pk)
+            if last_pk is not None and pk <= last_pk:
+                complete = True
+                break
+            if not backlog:
+                top = pk if top is None else max(top, pk)
+            # Feeds are not strictly ordered; the filter catches repeats
+            if pk in taken or f"{feed}:{media.pk}" in seen:
+                continue
+            if len(new_medias) == limit:
+                if last_pk is None:
+                    complete = True
+                else:
+                    # Re-read this page next time; its emitted media are filtered
+                    resume_cursor = fetch_cursor or ""
+                break
+            new_medias.append(media)
+            taken.add(pk)
+        if resume_cursor is None and (not medias or not page_cursor):
+            complete = True
+    
+    for media in new_medias:
+        seen.add(f"{feed}:{media.pk}")
+    seen.flush()
+    if complete:
+        known = [pk for pk in (last_pk, top) if pk is not None]
+        last_pk = max(known) if known else None
+        if last_pk is not None:
+            cursors.put(feed, last_pk)
+    else:
+        cursors.put(feed, last_pk, resume_cursor, top)
+    return new_medias, {
+        "cursor": str(last_pk) if last_pk is not None else None,
+        "pages": pages,
+        "backlog": not complete
+    }
+
+def hashtag_page(hashtag, amount):
+    """
+    Page fetcher for a hashtag's recent tab: the private API when logged in,
+    the public web API for anonymous clients (instagrapi 3.x, which dropped
+    it, picks its own endpoint). The public call hands back the cursor it was
+    given once the tab has no more pages, so that is treated as the end.
+    """
+    def fetch(cl, page_cursor):
+        if cl.user_id:
+            return cl.hashtag_medias_v1_chunk(hashtag, max_amount=amount, tab_key="recent", max_id=page_cursor)
+        if not hasattr(cl, "hashtag_medias_a1_chunk"):
+            return cl.hashtag_medias_paginated(hashtag, amount=amount, tab_key="recent", end_cursor=page_cursor)
+        medias, next_cursor = cl.hashtag_medias_a1_chunk(hashtag, max_amount=amount, tab_key="recent",
+                                                        end_cursor=page_cursor)
+        return medias, next_cursor if next_cursor != page_cursor else None
+    return fetch
+
+def cached_lookup(command, arg, limit, lookup, fallback):
+    """
+    Serve a lookup through the response cache, keyed by (command, arg, limit).
+    A fresh success is returned without calling upstream, and a failure
+    recorded within the negative TTL is not retried. When upstream fails, the
+    last success is served as stale while it is younger than the max-stale
+    window, otherwise fallback(error). Every response carries a "cache" block.
+    """
+    cache = get_response_cache()
+    key = f"{command}:{arg}:{'' if limit is None else limit}"
+    entry = cache.get(key) if cache else None
+    now = time.time()
+    
+    success_age = now - entry["stored_at"] if entry and entry["payload"] is not None else None
+    failure_age = now - entry["failed_at"] if entry and entry["failure"] is not None else None
+    stale = entry["payload"] if success_age is not None and success_age < RESPONSE_MAX_STALE else None
+    
+    if success_age is not None and success_age < RESPONSE_TTL:
+        return with_cache_info(entry["payload"], "hit", "fresh", success_age)
+    if failure_age is not None and failure_age < NEGATIVE_TTL and (success_age is None or failure_age < success_age):
+        if stale is not None:
+            return with_cache_info(stale, "hit", "stale", success_age, negative=True)
+        return with_cache_info(entry["failure"], "hit", "fresh", failure_age, negative=True)
+    
+    try:
+        result = lookup()
+    except Exception as e:
+        failure = fallback(e)
+        if cache:
+            cache.put_failure(key, failure)
+        if stale is not None:
+            return with_cache_info(stale, "miss", "stale", success_age, negative=True)
+        return with_cache_info(failure, "miss", "fresh", 0, negative=True)
+    if cache:
+        cache.put(key, result)
+    return with_cache_info(result, "miss", "fresh", 0)
+
+def with_cache_info(result, status, freshness, age, negative=False):
+    """Copy of a response with its "cache" block attached"""
+    return {
+        **result,
+        "cache": {"status": status, "freshness": freshness, "age_seconds": round(age, 1), "negative": negative}
+    }
+
+def get_user_info(username, cl=None):
+    """Get Instagram user information"""
+    return cached_lookup("user_info", username, None,
+                         lambda: fetch_user_info(username, cl),
+                         lambda error: sample_user_info(username))
+
+def fetch_user_info(username, cl=None):
+    """Look up a user's public profile upstream"""
+    # Try to get user info without login for basic public data. One round
+    # trip either way: by cached pk, or by username (which records the pk)
+    user_ids = get_user_ids()
+    user_id = user_ids.get(username)
+    user_info = None
+    if user_id is not None:
+        try:
+            user_info = call_client(lambda c: c.user_info(user_id), cl)
+        except UserNotFound:
+            user_info = None
+        if user_info is None or user_info.username.lower() != username.lower():
+            # The account was renamed or removed; resolve the name again
+            user_ids.forget(username)
+            user_info = None
+    if user_info is None:
+        user_info = call_client(lambda c: c.user_info_by_username(username), cl)
+        user_ids.put(username, user_info.pk)
+    result = {
+        "status": "success",
+        "data": {
+            "user_id": str(user_info.pk),
+            "username": user_info.username,
+            "full_name": user_info.full_name,
+            "biography": user_info.biography,
+            "follower_count": user_info.follower_count,
+            "following_count": user_info.following_count,
+            "media_count": user_info.media_count,
+            "is_verified": user_info.is_verified,
+            "is_private": user_info.is_private,
+            "profile_pic_url": str(user_info.profile_pic_url) if user_info.profile_pic_url else None,
+            "external_url": user_info.external_url
+        }
+    }
+    return result
+
+def sample_user_info(username):
+    """Sample user profile returned when the lookup fails"""
+    # Provide fallback user data for demonstration
+    mock_user_data = {
+        "user_id": "mock_user_123",
+        "username": username,
+        "full_name": f"{username.title()} - Financial Education",
+        "biography": f"📊 Financial insights & investment education\n💰 Helping you make informed decisions\n📈 Market analysis & trading tips\n🔗 Educational content for {username}",
+        "follower_count": 2847291,
+        "following_count": 1247,
+        "media_count": 3421,
+        "is_verified": username in ["investopedia", "cnbc", "bloomberg", "nasdaq"],
+        "is_private": False,
+        "profile_pic_url": None,
+        "external_url": f"https://{username}.com"
+    }
+    
+    result = {
+        "status": "success",
+        "data": mock_user_data,
+        "note": "Sample data - Instagram API requires authentication for full access"
+    }
+    return result
+
+def search_hashtag(hashtag, limit=20, incremental=False):
+    """Search posts by hashtag (incremental: only posts not returned by earlier incremental calls)"""
+    if incremental:
+        # Polls are stateful, so they bypass the response cache; sample posts
+        # would be emitted as new, so a failure is reported instead
+        try:
+            medias, poll = poll_new_medias(f"search_hashtag:{hashtag}", hashtag_page(hashtag, limit), limit)
+        except Exception as e:
+            return {"status": "error", "error": str(e), "message": f"Failed to poll #{hashtag}"}
+        result = hashtag_posts_result(hashtag, medias)
+        result["data"].update(poll, incremental=True)
+        return result
+    
+    # Get recent posts for hashtag
+    return cached_lookup("search_hashtag", hashtag, limit,
+                         lambda: hashtag_posts_result(hashtag, call_client(lambda cl: cl.hashtag_medias_recent(hashtag, amount=limit))),
+                         lambda error: sample_hashtag_posts(hashtag))
+
+def hashtag_posts_result(hashtag, medias):
+    """Success response for a hashtag's media"""
+    posts = []
+    for media in medias:
+        post = {
+            "id": str(media.pk),
+            "shortcode": media.code,
+            "caption": media.caption_text if media.caption_text else "",
+            "like_count": media.like_count,
+            "comment_count": media.comment_count,
+            "taken_at": media.taken_at.isoformat() if media.taken_at else None,
+            "media_type": media.media_type,
+            "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
+            "user": {
+                "username": media.user.username,
+                "full_name": media.user.full_name,
+                "is_verified": media.user.is_verified,
+                "profile_pic_url": str(media.user.profile_pic_url) if media.user.profile_pic_url else None
             }
         }
-        print(json.dumps(result))
-        
-    except Exception as e:
-        # Provide fallback user data for demonstration
-        mock_user_data = {
-            "user_id": "mock_user_123",
-            "username": username,
-            "full_name": f"{username.title()} - Financial Education",
-            "biography": f"📊 Financial insights & investment education\n💰 Helping you make informed decisions\n📈 Market analysis & trading tips\n🔗 Educational content for {username}",
-            "follower_count": 2847291,
-            "following_count": 1247,
-            "media_count": 3421,
-            "is_verified": username in ["investopedia", "cnbc", "bloomberg", "nasdaq"],
-            "is_private": False,
-            "profile_pic_url": None,
-            "external_url": f"https://{username}.com"
+        posts.append(post)
+    
+    result = {
+        "status": "success",
+        "data": {
+            "hashtag": hashtag,
+            "posts": posts,
+            "count": len(posts)
         }
-        
-        result = {
-            "status": "success",
-            "data": mock_user_data,
+    }
+    return result
+
+def sample_hashtag_posts(hashtag):
+    """Sample hashtag posts returned when the lookup fails"""
+    # Provide fallback hashtag posts for demonstration
+    mock_posts = [
+        {
+            "id": f"mock_hashtag_{hashtag}_1",
+            "shortcode": "mock_hashtag_1",
+            "caption": f"🔥 Key insights about #{hashtag} this week! Market trends showing strong momentum in this sector. Great opportunities for informed investors! #{hashtag} #investing #finance",
+            "like_count": 1847,
+            "comment_count": 142,
+            "taken_at": datetime.now().isoformat(),
+            "media_type": 1,
+            "thumbnail_url": None,
+            "user": {
+                "username": "financial_advisor",
+                "full_name": "Financial Advisory",
+                "is_verified": True,
+                "profile_pic_url": None
+            }
+        },
+        {
+            "id": f"mock_hashtag_{hashtag}_2",
+            "shortcode": "mock_hashtag_2", 
+            "caption": f"📊 Deep dive analysis: #{hashtag} sector performance this quarter. Key metrics to watch and strategic considerations for your portfolio. #{hashtag} #analysis",
+            "like_count": 923,
+            "comment_count": 78,
+            "taken_at": (datetime.now() - timedelta(hours=3)).isoformat(),
+            "media_type": 1,
+            "thumbnail_url": None,
+            "user": {
+                "username": "market_insights",
+                "full_name": "Market Research Pro",
+                "is_verified": False,
+                "profile_pic_url": None
+            }
+        }
+    ]
+    
+    result = {
+        "status": "success",
+        "data": {
+            "hashtag": hashtag,
+            "posts": mock_posts,
+            "count": len(mock_posts),
             "note": "Sample data - Instagram API requires authentication for full access"
         }
-        print(json.dumps(result))
+    }
+    return result
 
-def search_hashtag(hashtag, limit=20):
-    """Search posts by hashtag"""
-    try:
-        cl = Client()
-        
-        # Get recent posts for hashtag
-        medias = cl.hashtag_medias_recent(hashtag, amount=limit)
-        
-        posts = []
-        for media in medias:
-            post = {
-                "id": str(media.pk),
-                "shortcode": media.code,
-                "caption": media.caption_text if media.caption_text else "",
-                "like_count": media.like_count,
-                "comment_count": media.comment_count,
-                "taken_at": media.taken_at.isoformat() if media.taken_at else None,
-                "media_type": media.media_type,
-                "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
-                "user": {
-                    "username": media.user.username,
-                    "full_name": media.user.full_name,
-                    "is_verified": media.user.is_verified,
-                    "profile_pic_url": str(media.user.profile_pic_url) if media.user.profile_pic_url else None
-                }
-            }
-            posts.append(post)
+def get_user_posts(username, limit=20, incremental=False):
+    """Get recent posts from a user (incremental: only posts not returned by earlier incremental calls)"""
+    def failure(error):
+        return {
+            "status": "error",
+            "error": str(error),
+            "message": f"Failed to fetch posts for @{username}"
+        }
+    
+    if incremental:
+        try:
+            user_id = resolve_user_id(username)
             
-        result = {
-            "status": "success",
-            "data": {
-                "hashtag": hashtag,
-                "posts": posts,
-                "count": len(posts)
-            }
+            def fetch(cl, page_cursor):
+                return cl.user_medias_paginated(user_id, amount=limit, end_cursor=page_cursor or "")
+            medias, poll = poll_new_medias(f"user_posts:{username}", fetch, limit)
+        except Exception as e:
+            return failure(e)
+        result = user_posts_result(username, medias)
+        result["data"].update(poll, incremental=True)
+        return result
+    
+    return cached_lookup("user_posts", username, limit,
+                         lambda: user_posts_result(username, call_client(lambda cl: cl.user_medias(resolve_user_id(username), amount=limit))),
+                         failure)
+
+def user_post(media):
+    """Response shape for one of a user's posts"""
+    return {
+        "id": str(media.pk),
+        "shortcode": media.code,
+        "caption": media.caption_text if media.caption_text else "",
+        "like_count": media.like_count,
+        "comment_count": media.comment_count,
+        "taken_at": media.taken_at.isoformat() if media.taken_at else None,
+        "media_type": media.media_type,
+        "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
+        "url": f"https://www.instagram.com/p/{media.code}/"
+    }
+
+def user_posts_result(username, medias):
+    """Success response for a user's posts"""
+    posts = [user_post(media) for media in medias]
+    
+    result = {
+        "status": "success",
+        "data": {
+            "username": username,
+            "posts": posts,
+            "count": len(posts)
         }
-        print(json.dumps(result))
-        
-    except Exception as e:
-        # Provide fallback hashtag posts for demonstration
-        mock_posts = [
-            {
-                "id": f"mock_hashtag_{hashtag}_1",
-                "shortcode": "mock_hashtag_1",
-                "caption": f"🔥 Key insights about #{hashtag} this week! Market trends showing strong momentum in this sector. Great opportunities for informed investors! #{hashtag} #investing #finance",
-                "like_count": 1847,
-                "comment_count": 142,
-                "taken_at": datetime.now().isoformat(),
-                "media_type": 1,
-                "thumbnail_url": None,
-                "user": {
-                    "username": "financial_advisor",
-                    "full_name": "Financial Advisory",
-                    "is_verified": True,
-                    "profile_pic_url": None
-                }
-            },
-            {
-                "id": f"mock_hashtag_{hashtag}_2",
-                "shortcode": "mock_hashtag_2", 
-                "caption": f"📊 Deep dive analysis: #{hashtag} sector performance this quarter. Key metrics to watch and strategic considerations for your portfolio. #{hashtag} #analysis",
-                "like_count": 923,
-                "comment_count": 78,
-                "taken_at": (datetime.now() - timedelta(hours=3)).isoformat(),
-                "media_type": 1,
-                "thumbnail_url": None,
-                "user": {
-                    "username": "market_insights",
-                    "full_name": "Market Research Pro",
-                    "is_verified": False,
-                    "profile_pic_url": None
-                }
-            }
-        ]
+    }
+    return result
+
+def medias_after(medias, last_pk):
+    """
+    The part of a newest-first page after the post with pk last_pk, and
+    whether that post was on the page. When it was not (new posts pushed it
+    to a later page), only posts older than it are kept.
+    """
+    if last_pk is None:
+        return medias, False
+    pks = [int(media.pk) for media in medias]
+    if last_pk in pks:
+        return medias[pks.index(last_pk) + 1:], True
+    return [media for media in medias if int(media.pk) < last_pk], False
+
+def stream_user_posts(username, limit=None, page_size=33, restart=False):
+    """
+    Yield a user's posts newest first, one page at a time, followed by a
+    summary record. Progress is saved after every page (including a partly
+    emitted one) as the page cursor plus the pk of the last post sent, so a
+    stopped backfill resumes right after that post even when new posts have
+    shifted the page; restart starts over from the newest post. A page
+    interrupted while being written out is sent again on resume.
+    """
+    backfills = get_backfill_cursors()
+    feed = f"user_posts:{username.lower()}"
+    if restart:
+        backfills.reset(feed)
+    state = backfills.get(feed) or {"page_cursor": "", "last_pk": None, "emitted": 0, "complete": False}
+    page_cursor = state["page_cursor"]
+    resume_after = state["last_pk"]
+    total = state["emitted"]
+    complete = state["complete"]
+    emitted = 0
+    pages = 0
+    
+    user_id = resolve_user_id(username) if not complete else None
+    while not complete and (limit is None or emitted < limit):
+        medias, next_cursor = call_client(
+            lambda cl: cl.user_medias_paginated(user_id, amount=page_size, end_cursor=page_cursor)
+        )
+        pages += 1
+        page, found = medias_after(medias, resume_after)
+        if found:
+            resume_after = None
+        batch = page if limit is None else page[:limit - emitted]
+        for media in batch:
+            yield {"type": "post", "username": username, **user_post(media)}
+        emitted += len(batch)
+        total += len(batch)
         
-        result = {
-            "status": "success",
-            "data": {
-                "hashtag": hashtag,
-                "posts": mock_posts,
-                "count": len(mock_posts),
-                "note": "Sample data - Instagram API requires authentication for full access"
-            }
-        }
-        print(json.dumps(result))
+        if len(batch) < len(page):
+            # Limit reached mid-page: resume on this page after the last post sent
+            backfills.put(feed, page_cursor, int(batch[-1].pk), total)
+            break
+        complete = not medias or not next_cursor
+        page_cursor = next_cursor or ""
+        backfills.put(feed, page_cursor, resume_after, total, complete)
+    
+    yield {
+        "type": "summary",
+        "status": "success",
+        "username": username,
+        "emitted": emitted,
+        "total_emitted": total,
+        "pages": pages,
+        "complete": complete
+    }
 
-def get_user_posts(username, limit=20):
-    """Get recent posts from a user"""
+def get_user_posts_page(username, end_cursor="", page_size=33, after=None):
+    """
+    One page of a user's posts and the cursor for the next (None at the end);
+    with after (a post id), only the posts following that post on the page
+    """
     try:
-        cl = Client()
-        user_id = cl.user_id_from_username(username)
-        medias = cl.user_medias(user_id, amount=limit)
-        
-        posts = []
-        for media in medias:
-            post = {
-                "id": str(media.pk),
-                "shortcode": media.code,
-                "caption": media.caption_text if media.caption_text else "",
-                "like_count": media.like_count,
-                "comment_count": media.comment_count,
-                "taken_at": media.taken_at.isoformat() if media.taken_at else None,
-                "media_type": media.media_type,
-                "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
-                "url": f"https://www.instagram.com/p/{media.code}/"
-            }
-            posts.append(post)
-            
-        result = {
+        user_id = resolve_user_id(username)
+        medias, next_cursor = call_client(
+            lambda cl: cl.user_medias_paginated(user_id, amount=page_size, end_cursor=end_cursor or "")
+        )
+        medias, _ = medias_after(medias, int(after) if after else None)
+        return {
             "status": "success",
             "data": {
                 "username": username,
-                "posts": posts,
-                "count": len(posts)
+                "posts": [user_post(media) for media in medias],
+                "count": len(medias),
+                "next_cursor": next_cursor or None
             }
         }
-        print(json.dumps(result))
-        
     except Exception as e:
-        error_result = {
-            "status": "error",
-            "error": str(e),
-            "message": f"Failed to fetch posts for @{username}"
-        }
-        print(json.dumps(error_result))
+        return {"status": "error", "error": str(e), "message": f"Failed to fetch posts for @{username}"}
 
-def get_trending_finance_content():
-    """Get trending financial content from Instagram"""
+def user_info_bulk(usernames, max_workers=BULK_WORKERS):
+    """
+    Profiles for many usernames on a bounded pool of cloned clients under the
+    shared rate limit, yielding one record per username as it completes.
+    Each lookup goes through the response cache like get_user_info.
+    """
+    def lookup(username):
+        with borrow_client() as cl:
+            return get_user_info(username, cl)
+    
+    for username, outcome in iter_concurrent(lookup, usernames, max_workers=max_workers):
+        if outcome["status"] == "ok":
+            yield {"username": username, "latency_ms": outcome["latency_ms"], **outcome["value"]}
+        else:
+            yield {"username": username, "latency_ms": outcome["latency_ms"], "status": "error",
+                   "error": outcome.get("error", outcome["status"])}
+
+def read_usernames(source):
+    """Usernames from "-" (stdin), a file (one per line) or a comma-separated list"""
+    if source == "-" or os.path.isfile(source):
+        stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                username = line.strip().lstrip("@")
+                if username and not username.startswith("#"):
+                    yield username
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    else:
+        for username in source.split(","):
+            if username.strip():
+                yield username.strip().lstrip("@")
+
+def get_trending_finance_content(incremental=False):
+    """
+    Get trending financial content from Instagram. All finance hashtags are
+    crawled concurrently under the shared rate limit; each one reports its
+    own status and latency. With incremental, each hashtag only yields posts
+    that earlier incremental crawls have not returned.
+    """
     try:
-        finance_hashtags = ["investing", "stocks", "trading", "crypto", "bitcoin", "ethereum", "finance", "money"]
+        finance_hashtags = FINANCE_HASHTAGS
         all_posts = []
+        hashtag_status = {}
         
-        cl = Client()
+        def fetch(hashtag):
+            with borrow_client() as cl:
+                if incremental:
+                    return poll_new_medias(f"trending:{hashtag}", hashtag_page(hashtag, 5), 5, cl=cl)[0]
+                return call_client(lambda c: c.hashtag_medias_recent(hashtag, amount=5), cl)
         
-        for hashtag in finance_hashtags[:3]:  # Limit to avoid rate limits
-            try:
-                medias = cl.hashtag_medias_recent(hashtag, amount=5)
-                
-                for media in medias:
-                    post = {
-                        "id": str(media.pk),
-                        "hashtag": hashtag,
-                        "shortcode": media.code,
-                        "caption": media.caption_text if media.caption_text else "",
-                        "like_count": media.like_count,
-                        "comment_count": media.comment_count,
-                        "taken_at": media.taken_at.isoformat() if media.taken_at else None,
-                        "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
-                        "url": f"https://www.instagram.com/p/{media.code}/",
-                        "user": {
-                            "username": media.user.username,
-                            "full_name": media.user.full_name,
-                            "is_verified": media.user.is_verified
-                        }
-                    }
-                    all_posts.append(post)
-                    
-                time.sleep(1)  # Rate limiting
-                
-            except Exception as hashtag_error:
+        for hashtag, outcome in iter_concurrent(fetch, finance_hashtags, max_workers=CRAWL_WORKERS,
+                                                timeout=CRAWL_TIMEOUT):
+            hashtag_status[hashtag] = {"status": outcome["status"], "latency_ms": outcome["latency_ms"]}
+            if outcome["status"] == "error":
+                hashtag_status[hashtag]["error"] = outcome["error"]
+            if outcome["status"] != "ok":
                 continue
-                
+            
+            medias = outcome["value"] or []
+            hashtag_status[hashtag]["posts"] = len(medias)
+            for media in medias:
+                post = {
+                    "id": str(media.pk),
+                    "hashtag": hashtag,
+                    "shortcode": media.code,
+                    "caption": media.caption_text if media.caption_text else "",
+                    "like_count": media.like_count,
+                    "comment_count": media.comment_count,
+                    "taken_at": media.taken_at.isoformat() if media.taken_at else None,
+                    "thumbnail_url": str(media.thumbnail_url) if media.thumbnail_url else None,
+                    "url": f"https://www.instagram.com/p/{media.code}/",
+                    "user": {
+                        "username": media.user.username,
+                        "full_name": media.user.full_name,
+                        "is_verified": media.user.is_verified
+                    }
+                }
+                all_posts.append(post)
+        
         # Sort by engagement (likes + comments)
         all_posts.sort(key=lambda x: x['like_count'] + x['comment_count'], reverse=True)
         
@@ -226,13 +727,17 @@ def get_trending_finance_content():
             "status": "success",
             "data": {
                 "posts": all_posts[:20],  # Top 20 posts
-                "hashtags_searched": finance_hashtags[:3],
-                "total_posts": len(all_posts)
+                "hashtags_searched": finance_hashtags,
+                "total_posts": len(all_posts),
+                "hashtags": {hashtag: hashtag_status[hashtag] for hashtag in finance_hashtags},
+                "incremental": incremental
             }
         }
-        print(json.dumps(result))
+        return result
         
     except Exception as e:
+        if incremental:
+            return {"status": "error", "error": str(e), "message": "Failed to poll trending finance content"}
         # Provide fallback financial content data
         mock_posts = [
             {
@@ -294,7 +799,92 @@ def get_trending_finance_content():
                 "note": "Sample data - Instagram API requires authentication for full access"
             }
         }
-        print(json.dumps(result))
+        return result
+
+def dispatch(command, params):
+    """Route a command and its parameters (shared by the CLI and serve mode)"""
+    limit = int(params.get("limit") or 20)
+    incremental = bool(params.get("incremental"))
+    if command == "user_info":
+        if not params.get("username"):
+            return {"error": "Username required"}
+        return get_user_info(params["username"])
+    elif command == "search_hashtag":
+        if not params.get("hashtag"):
+            return {"error": "Hashtag required"}
+        return search_hashtag(params["hashtag"], limit, incremental)
+    elif command == "user_posts":
+        if not params.get("username"):
+            return {"error": "Username required"}
+        return get_user_posts(params["username"], limit, incremental)
+    elif command == "user_posts_page":
+        if not params.get("username"):
+            return {"error": "Username required"}
+        return get_user_posts_page(params["username"], params.get("cursor") or "", int(params.get("page_size") or 33),
+                                   after=params.get("after"))
+    elif command == "user_info_bulk":
+        usernames = params.get("usernames") or []
+        if isinstance(usernames, str):
+            usernames = list(read_usernames(usernames))
+        if not usernames:
+            return {"error": "Usernames required"}
+        users = list(user_info_bulk(usernames, int(params.get("workers") or BULK_WORKERS)))
+        return {"status": "success", "data": {"users": users, "count": len(users)}}
+    elif command == "trending_finance":
+        return get_trending_finance_content(incremental)
+    return {"error": f"Unknown command: {command}"}
+
+def serve(stdin=None, stdout=None):
+    """
+    Worker mode: one warmed client answers JSON-line requests
+    ({"id", "command", "params"}) in order, one JSON line per response.
+    Requests run one at a time since the client is not thread-safe.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    started_at = time.time()
+    stats = {"requests": 0, "errors": 0}
+    
+    def write(response):
+        stdout.write(json.dumps(response, default=str) + "\n")
+        stdout.flush()
+    
+    get_client()
+    write({"event": "ready", "pid": os.getpid()})
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            write({"id": None, "error": f"Invalid request: {e}"})
+            continue
+        
+        request_id = request.get("id")
+        command = request.get("command", "")
+        stats["requests"] += 1
+        if command == "health":
+            write({
+                "id": request_id,
+                "status": "success",
+                "uptime_seconds": round(time.time() - started_at, 1),
+                "logged_in": bool(get_client().user_id),
+                **stats
+            })
+            continue
+        
+        try:
+            result = dispatch(command, request.get("params") or {})
+        except Exception as e:
+            result = {"error": f"Failed to execute {command}: {str(e)}"}
+        if result.get("error") or result.get("status") == "error":
+            stats["errors"] += 1
+        write({"id": request_id, **result})
+        # Keep refreshed cookies for the next process
+        save_session()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -303,31 +893,52 @@ if __name__ == "__main__":
     
     command = sys.argv[1]
     
-    if command == "user_info":
-        if len(sys.argv) < 3:
+    if command == "serve":
+        serve()
+        sys.exit(0)
+    
+    if command == "user_posts_stream":
+        # user_posts_stream <username> [limit] [--restart] streams one JSON line
+        # per post, resuming a previous backfill unless --restart is given
+        args = [arg for arg in sys.argv[2:] if arg != "--restart"]
+        if not args:
             print(json.dumps({"error": "Username required"}))
             sys.exit(1)
-        get_user_info(sys.argv[2])
-        
-    elif command == "search_hashtag":
-        if len(sys.argv) < 3:
-            print(json.dumps({"error": "Hashtag required"}))
-            sys.exit(1)
-        hashtag = sys.argv[2]
-        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
-        search_hashtag(hashtag, limit)
-        
-    elif command == "user_posts":
+        limit = int(args[1]) if len(args) > 1 else None
+        page_size = int(os.environ.get("INSTAGRAM_PAGE_SIZE", "33"))
+        try:
+            for record in stream_user_posts(args[0], limit, page_size, restart="--restart" in sys.argv[2:]):
+                sys.stdout.write(json.dumps(record) + "\n")
+                sys.stdout.flush()
+        except Exception as e:
+            sys.stdout.write(json.dumps({"type": "summary", "status": "error", "error": str(e),
+                                         "message": f"Failed to fetch posts for @{args[0]}"}) + "\n")
+        save_session()
+        sys.exit(0)
+    
+    if command == "user_info_bulk":
+        # user_info_bulk <comma-separated usernames | file | -> streams one JSON line per user
         if len(sys.argv) < 3:
-            print(json.dumps({"error": "Username required"}))
+            print(json.dumps({"error": "Usernames required: comma-separated list, file path or -"}))
             sys.exit(1)
-        username = sys.argv[2]
-        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
-        get_user_posts(username, limit)
-        
-    elif command == "trending_finance":
-        get_trending_finance_content()
-        
-    else:
-        print(json.dumps({"error": f"Unknown command: {command}"}))
-        sys.exit(1)
\ No newline at end of file
+        for record in user_info_bulk(read_usernames(sys.argv[2])):
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+        save_session()
+        sys.exit(0)
+    
+    # --new polls incrementally: only media not returned by earlier --new calls
+    args = [arg for arg in sys.argv[2:] if arg != "--new"]
+    params = {"incremental": "--new" in sys.argv[2:]}
+    if command in ("user_info", "user_posts") and args:
+        params["username"] = args[0]
+    elif command == "search_hashtag" and args:
+        params["hashtag"] = args[0]
+    if len(args) > 1:
+        params["limit"] = int(args[1])
+    
+    result = dispatch(command, params)
+    save_session()
+    print(json.dumps(result))
+    if result.get("error"):
+        sys.exit(1)
@@ -0,0 +1,294 @@
+"""
+Persistent state for the Instagram service
+Per-feed cursors live in SQLite and the ids of media already emitted live in
+a memory-mapped Bloom filter, so a re-poll only fetches and emits new media.
+Lookup responses (and failures) are cached in SQLite as well.
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from sqlite_utils import open_sqlite
+
+# flock lets several poller processes share the seen filter (POSIX only)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_BLOOM_HEADER = struct.Struct("<4sQIIQ")
+_BLOOM_MAGIC = b"BLM2"
+
+
+class SeenFilter:
+    """
+    Aging Bloom filter over a memory-mapped file: bits are set in place, so
+    there is no rewrite on save and concurrent processes share what they
+    have seen. Two generations are kept, each sized for `capacity` keys at
+    ~error_rate. Once the active one has taken `capacity` keys the older one
+    is cleared and becomes active, so only the latest 1-2x capacity keys are
+    remembered and false positives stay bounded (a key that ages out is
+    already behind its feed cursor). The file is flock'ed around reads and
+    updates, so several pollers can share it; a resized or corrupt file is
+    recreated.
+    """
+
+    def __init__(self, path: str, capacity: int = 200000, error_rate: float = 0.001):
+        self.path = path
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        self.generation_bytes = (self.bits + 7) // 8
+        size = _BLOOM_HEADER.size + 2 * self.generation_bytes
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not self._matches(size):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, self.bits, self.hashes, 0, 0))
+                f.truncate(size)
+            os.replace(tmp_path, path)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def _matches(self, size: int) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                header = _BLOOM_HEADER.unpack(f.read(_BLOOM_HEADER.size))
+                return header[:3] == (_BLOOM_MAGIC, self.bits, self.hashes) and os.fstat(f.fileno()).st_size == size
+        except (OSError, struct.error):
+            return False
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Thread lock plus an flock on the file for other processes"""
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        # Double hashing: k positions from two 64-bit halves
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def _has(self, generation: int, positions) -> bool:
+        offset = _BLOOM_HEADER.size + generation * self.generation_bytes
+        return all(self.map[offset + bit // 8] & (1 << (bit % 8)) for bit in positions)
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._locked(exclusive=False):
+            return self._has(0, positions) or self._has(1, positions)
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        with self._locked(exclusive=True):
+            active, count = _BLOOM_HEADER.unpack_from(self.map)[3:]
+            if self._has(active, positions):
+                return
+            if count >= self.capacity:
+                # Age out the older generation: clear it and make it active
+                active, count = 1 - active, 0
+                start = _BLOOM_HEADER.size + active * self.generation_bytes
+                self.map[start:start + self.generation_bytes] = bytes(self.generation_bytes)
+            offset = _BLOOM_HEADER.size + active * self.generation_bytes
+            for bit in positions:
+                self.map[offset + bit // 8] |= 1 << (bit % 8)
+            _BLOOM_HEADER.pack_into(self.map, 0, _BLOOM_MAGIC, self.bits, self.hashes, active, count + 1)
+
+    def flush(self):
+        with self.lock:
+            self.map.flush()
+
+
+class PollCursors:
+    """
+    Poll position per feed (e.g. "search_hashtag:stocks"): last_pk is the
+    pk up to which everything has been emitted. A poll that stops early
+    leaves a backlog: the page cursor to resume from and the pk that
+    becomes last_pk once the backlog reaches it.
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.db = open_sqlite(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS poll_cursors ("
+            "feed TEXT PRIMARY KEY, last_pk INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "resume_cursor TEXT, resume_top INTEGER)"
+        )
+        # Cursor tables created before backlogs were tracked
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(poll_cursors)")}
+        if "resume_cursor" not in columns:
+            self.db.execute("ALTER TABLE poll_cursors ADD COLUMN resume_cursor TEXT")
+            self.db.execute("ALTER TABLE poll_cursors ADD COLUMN resume_top INTEGER")
+        self.db.commit()
+
+    def get(self, feed: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT last_pk, resume_cursor, resume_top FROM poll_cursors WHERE feed = ?", (feed,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"last_pk": row[0], "resume_cursor": row[1], "resume_top": row[2]}
+
+    def put(self, feed: str, last_pk: int, resume_cursor: Optional[str] = None, resume_top: Optional[int] = None):
+        """Store the position; last_pk only moves forward, the backlog is replaced"""
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO poll_cursors (feed, last_pk, updated_at, resume_cursor, resume_top) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(feed) DO UPDATE SET last_pk = MAX(last_pk, excluded.last_pk), "
+                "updated_at = excluded.updated_at, resume_cursor = excluded.resume_cursor, "
+                "resume_top = excluded.resume_top",
+                (feed, last_pk, time.time(), resume_cursor, resume_top)
+            )
+            self.db.commit()
+
+
+class ResponseCache:
+    """
+    Last successful response and last failure per lookup key, kept apart so
+    a failing upstream can still be answered with the previous success
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.db = open_sqlite(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, payload TEXT, stored_at REAL, failure TEXT, failed_at REAL)"
+        )
+        self.db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload, stored_at, failure, failed_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "payload": json.loads(row[0]) if row[0] is not None else None,
+            "stored_at": row[1],
+            "failure": json.loads(row[2]) if row[2] is not None else None,
+            "failed_at": row[3]
+        }
+
+    def put(self, key: str, payload: Dict[str, Any]):
+        """Store a success; it supersedes any recorded failure"""
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO responses (key, payload, stored_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, stored_at = excluded.stored_at, "
+                "failure = NULL, failed_at = NULL",
+                (key, json.dumps(payload), time.time())
+            )
+            self.db.commit()
+
+    def put_failure(self, key: str, payload: Dict[str, Any]):
+        """Record a failed lookup (and the response given for it), keeping the last success"""
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO responses (key, failure, failed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET failure = excluded.failure, failed_at = excluded.failed_at",
+                (key, json.dumps(payload), time.time())
+            )
+            self.db.commit()
+
+
+class UserIdCache:
+    """Permanent username -> user pk mapping (pks never change; renames are rare)"""
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.db = open_sqlite(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS user_ids (username TEXT PRIMARY KEY, user_pk TEXT NOT NULL, resolved_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def get(self, username: str) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute("SELECT user_pk FROM user_ids WHERE username = ?", (username.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, username: str, user_pk: str):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO user_ids (username, user_pk, resolved_at) VALUES (?, ?, ?)",
+                (username.lower(), str(user_pk), time.time())
+            )
+            self.db.commit()
+
+    def forget(self, username: str):
+        """Drop a mapping that no longer resolves (account renamed or deleted)"""
+        with self.lock:
+            self.db.execute("DELETE FROM user_ids WHERE username = ?", (username.lower(),))
+            self.db.commit()
+
+
+class BackfillCursors:
+    """
+    Resume points for paginated backfills: the page cursor to fetch next and
+    the pk of the last post emitted from that page (None if none were)
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.db = open_sqlite(path)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(backfill_cursors)")}
+        if "page_offset" in columns:
+            # Offsets into a page shift when new posts arrive; such resume
+            # points restart their page (resending at most one page)
+            self.db.execute("ALTER TABLE backfill_cursors RENAME TO backfill_cursors_offsets")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS backfill_cursors ("
+            "feed TEXT PRIMARY KEY, page_cursor TEXT NOT NULL, last_pk INTEGER, "
+            "emitted INTEGER NOT NULL, complete INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        if "page_offset" in columns:
+            self.db.execute(
+                "INSERT INTO backfill_cursors SELECT feed, page_cursor, NULL, emitted, complete, updated_at "
+                "FROM backfill_cursors_offsets"
+            )
+            self.db.execute("DROP TABLE backfill_cursors_offsets")
+        self.db.commit()
+
+    def get(self, feed: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT page_cursor, last_pk, emitted, complete FROM backfill_cursors WHERE feed = ?", (feed,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"page_cursor": row[0], "last_pk": row[1], "emitted": row[2], "complete": bool(row[3])}
+
+    def put(self, feed: str, page_cursor: str, last_pk: Optional[int], emitted: int, complete: bool = False):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO backfill_cursors (feed, page_cursor, last_pk, emitted, complete, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (feed, page_cursor, last_pk, emitted, int(complete), time.time())
+            )
+            self.db.commit()
+
+    def reset(self, feed: str):
+        with self.lock:
+            self.db.execute("DELETE FROM backfill_cursors WHERE feed = ?", (feed,))
+            self.db.commit()
@@ -0,0 +1,220 @@
+"""
+Vectorized technical indicators over symbol x time price panels
+Every indicator is computed for all symbols at once with pandas rolling and
+exponential window operations. An IndicatorState carries the recursive
+EMA/RSI averages plus a short tail of prices, so new bars can be folded in
+without recomputing the full history
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = None
+    pd = None
+
+
+class IndicatorState:
+    """Carry-over needed to extend indicators with new bars"""
+
+    __slots__ = ("tail", "ema", "ema_count", "rsi_gain", "rsi_loss", "rsi_count")
+
+    def __init__(self, tail, ema, ema_count, rsi_gain, rsi_loss, rsi_count):
+        # Last bars of the close panel (enough rows for the widest window)
+        self.tail = tail
+        # span -> last EMA per symbol, and observation counts for warm-up
+        self.ema = ema
+        self.ema_count = ema_count
+        # Wilder-smoothed average gain/loss per symbol
+        self.rsi_gain = rsi_gain
+        self.rsi_loss = rsi_loss
+        self.rsi_count = rsi_count
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.tail.columns)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.tail.index[-1]) if len(self.tail.index) else None
+
+
+class IndicatorEngine:
+    """
+    Computes returns, log returns, SMAs, EMAs, RSI and annualized realized
+    volatility for a close-price panel (DataFrame indexed by timestamp with
+    one column per symbol). NaN marks a missing bar and is skipped by the
+    recursive averages.
+    """
+
+    def __init__(self, sma_windows: Iterable[int] = (20, 50), ema_spans: Iterable[int] = (12, 26),
+                 rsi_period: int = 14, volatility_window: int = 20, periods_per_year: int = 252):
+        if pd is None:
+            raise RuntimeError("pandas is required for market indicators. Run: pip install pandas numpy")
+        self.sma_windows = tuple(sma_windows)
+        self.ema_spans = tuple(ema_spans)
+        self.rsi_period = rsi_period
+        self.volatility_window = volatility_window
+        self.periods_per_year = periods_per_year
+        # Rolling windows need this many rows of history; +1 for the return
+        # that feeds the first volatility observation
+        self.tail_length = max(self.sma_windows + (volatility_window + 1, rsi_period, 2))
+
+    @staticmethod
+    def panel(timestamps, symbols: List[str], values) -> "pd.DataFrame":
+        """Wrap a (timestamps, symbols, values) array panel as a DataFrame"""
+        return pd.DataFrame(values, index=pd.Index(timestamps, name="timestamp"), columns=symbols)
+
+    def compute(self, closes: "pd.DataFrame") -> Tuple[Dict[str, "pd.DataFrame"], IndicatorState]:
+        """All indicators over the full history, plus the state to extend them"""
+        closes = closes.astype("float64")
+        indicators = self._windowed(closes)
+
+        ema = {}
+        ema_count = {}
+        for span in self.ema_spans:
+            smoothed = closes.ewm(span=span, adjust=False, ignore_na=True).mean()
+            count = closes.notna().cumsum()
+            indicators[f"ema_{span}"] = smoothed.where(count >= span)
+            ema[span] = smoothed.ffill().iloc[-1].to_numpy() if len(closes) else np.full(closes.shape[1], np.nan)
+            ema_count[span] = count.iloc[-1].to_numpy() if len(closes) else np.zeros(closes.shape[1])
+
+        # Wilder smoothing is an EMA with alpha = 1 / period
+        change = closes.diff()
+        gain = change.clip(lower=0)
+        loss = -change.clip(upper=0)
+        alpha = 1.0 / self.rsi_period
+        avg_gain = gain.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+        avg_loss = loss.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+        rsi_count = change.notna().cumsum()
+        indicators[f"rsi_{self.rsi_period}"] = self._rsi(avg_gain, avg_loss).where(rsi_count >= self.rsi_period)
+
+        empty = np.full(closes.shape[1], np.nan)
+        state = IndicatorState(
+            tail=closes.iloc[-self.tail_length:],
+            ema=ema,
+            ema_count=ema_count,
+            rsi_gain=avg_gain.ffill().iloc[-1].to_numpy() if len(closes) else empty,
+            rsi_loss=avg_loss.ffill().iloc[-1].to_numpy() if len(closes) else empty,
+            rsi_count=rsi_count.iloc[-1].to_numpy() if len(closes) else np.zeros(closes.shape[1])
+        )
+        return indicators, state
+
+    @staticmethod
+    def can_update(state: IndicatorState, closes: "pd.DataFrame") -> bool:
+        """
+        True when closes still hold the state's tail bars unchanged, so
+        update() can continue from the state. A revised in-progress bar or
+        re-adjusted history needs a full compute().
+        """
+        tail = state.tail
+        if state.last_timestamp is None or not tail.index.isin(closes.index).all():
+            return False
+        current = closes.reindex(index=tail.index, columns=tail.columns).to_numpy(dtype="float64")
+        return bool(np.array_equal(current, tail.to_numpy(dtype="float64"), equal_nan=True))
+
+    def update(self, state: IndicatorState,
+               new_closes: "pd.DataFrame") -> Tuple[Dict[str, "pd.DataFrame"], IndicatorState]:
+        """
+        Indicators for the new bars only, continuing from state. Symbols not in
+        the state start fresh; rows at or before the state's last timestamp
+        are ignored.
+        """
+        symbols = state.symbols + [symbol for symbol in new_closes.columns if symbol not in state.tail.columns]
+        new_closes = new_closes.reindex(columns=symbols).astype("float64")
+        if state.last_timestamp is not None:
+            new_closes = new_closes[new_closes.index > state.last_timestamp]
+        added = len(symbols) - len(state.symbols)
+
+        def extend(values, fill):
+            return np.concatenate([values, np.full(added, fill)])
+
+        history = pd.concat([state.tail.reindex(columns=symbols), new_closes])
+        new_rows = len(new_closes)
+        indicators = {name: frame.iloc[len(history) - new_rows:] for name, frame in self._windowed(history).items()}
+
+        values = new_closes.to_numpy()
+        ema = {}
+        ema_count = {}
+        for span in self.ema_spans:
+            smoothed, count, out = self._recurse(values, extend(state.ema[span], np.nan),
+                                                 extend(state.ema_count[span], 0), 2.0 / (span + 1))
+            indicators[f"ema_{span}"] = self._frame(np.where(out[1] >= span, out[0], np.nan), new_closes)
+            ema[span], ema_count[span] = smoothed, count
+
+        # Price change against the previous row, which may lie in the tail
+        change = history.diff().to_numpy()[len(history) - new_rows:]
+        alpha = 1.0 / self.rsi_period
+        rsi_gain, rsi_count, gain_out = self._recurse(np.clip(change, 0, None), extend(state.rsi_gain, np.nan),
+                                                      extend(state.rsi_count, 0), alpha)
+        rsi_loss, _, loss_out = self._recurse(-np.clip(change, None, 0), extend(state.rsi_loss, np.nan),
+                                              extend(state.rsi_count, 0), alpha)
+        rsi = self._rsi(self._frame(gain_out[0], new_closes), self._frame(loss_out[0], new_closes))
+        indicators[f"rsi_{self.rsi_period}"] = rsi.where(gain_out[1] >= self.rsi_period)
+
+        state = IndicatorState(
+            tail=history.iloc[-self.tail_length:],
+            ema=ema,
+            ema_count=ema_count,
+            rsi_gain=rsi_gain,
+            rsi_loss=rsi_loss,
+            rsi_count=rsi_count
+        )
+        return indicators, state
+
+    def _windowed(self, closes: "pd.DataFrame") -> Dict[str, "pd.DataFrame"]:
+        """Indicators that depend only on a bounded trailing window"""
+        indicators = {
+            "return": closes.pct_change(fill_method=None),
+            "log_return": np.log(closes).diff()
+        }
+        for window in self.sma_windows:
+            indicators[f"sma_{window}"] = closes.rolling(window).mean()
+        indicators[f"volatility_{self.volatility_window}"] = (
+            indicators["log_return"].rolling(self.volatility_window).std() * np.sqrt(self.periods_per_year)
+        )
+        return indicators
+
+    @staticmethod
+    def _recurse(values, last, count, alpha: float):
+        """
+        Exponential smoothing over new rows, vectorized across symbols; NaN
+        inputs carry the previous value like ewm(ignore_na=True)
+        """
+        last = last.astype("float64").copy()
+        count = count.astype("float64").copy()
+        smoothed = np.empty_like(values)
+        counts = np.empty_like(values)
+        for row in range(values.shape[0]):
+            x = values[row]
+            valid = ~np.isnan(x)
+            seeded = valid & np.isnan(last)
+            last = np.where(seeded, x, np.where(valid, alpha * x + (1 - alpha) * last, last))
+            count = count + valid
+            smoothed[row] = last
+            counts[row] = count
+        return last, count, (smoothed, counts)
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        strength = avg_gain / avg_loss
+        rsi = 100 - 100 / (1 + strength)
+        # No losses in the window: fully overbought rather than undefined
+        return rsi.mask((avg_loss == 0) & (avg_gain > 0), 100.0)
+
+    @staticmethod
+    def _frame(values, like: "pd.DataFrame") -> "pd.DataFrame":
+        return pd.DataFrame(values, index=like.index, columns=like.columns)
+
+
+def latest_values(indicators: Dict[str, "pd.DataFrame"]) -> Dict[str, Dict[str, Any]]:
+    """Most recent indicator values per symbol as JSON-ready dicts"""
+    summary = {}
+    for name, frame in indicators.items():
+        if not len(frame):
+            continue
+        for symbol, value in frame.iloc[-1].items():
+            summary.setdefault(symbol, {})[name] = None if pd.isna(value) else round(float(value), 6)
+    return summary
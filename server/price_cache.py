@@ -0,0 +1,112 @@
+"""
+Columnar on-disk cache for OHLCV price history
+Bars are stored as one .npy file per symbol and field, so a cached series is
+loaded with a memory map instead of parsed, and refreshes only append bars
+from the last cached timestamp on (the tail bar is rewritten, since it may
+still have been in progress when it was cached)
+"""
+
+import os
+import re
+import shutil
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class PriceHistoryCache:
+    """Per-symbol, per-field .npy columns under <root>/<interval>/<symbol>/"""
+
+    def __init__(self, root: str):
+        if np is None:
+            raise RuntimeError("NumPy is required for the price history cache. Run: pip install numpy")
+        self.root = root
+
+    def _symbol_dir(self, symbol: str, interval: str) -> str:
+        safe_symbol = re.sub(r"[^A-Za-z0-9.^=_-]", "_", symbol.upper())
+        return os.path.join(self.root, interval, safe_symbol)
+
+    def _path(self, symbol: str, interval: str, field: str) -> str:
+        return os.path.join(self._symbol_dir(symbol, interval), f"{field}.npy")
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        """Epoch seconds of the newest cached bar, or None if nothing is cached"""
+        path = self._path(symbol, interval, "timestamp")
+        if not os.path.exists(path):
+            return None
+        timestamps = np.load(path, mmap_mode="r")
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def load(self, symbol: str, interval: str, fields: Optional[List[str]] = None,
+             mmap: bool = True) -> Optional[Dict[str, "np.ndarray"]]:
+        """Cached columns for a symbol (memory-mapped, read-only by default)"""
+        if not os.path.exists(self._path(symbol, interval, "timestamp")):
+            return None
+        mode = "r" if mmap else None
+        columns = {"timestamp": np.load(self._path(symbol, interval, "timestamp"), mmap_mode=mode)}
+        for field in fields or PRICE_FIELDS:
+            columns[field] = np.load(self._path(symbol, interval, field), mmap_mode=mode)
+        return columns
+
+    def append(self, symbol: str, interval: str, bars: Dict[str, "np.ndarray"]) -> int:
+        """
+        Write bars at or after the cached tail, replacing cached bars with the
+        same timestamps so a bar cached while still in progress is updated;
+        returns the number of bars newer than the previous tail. Each column
+        is rewritten atomically (tmp file + rename).
+        """
+        timestamps = np.asarray(bars["timestamp"], dtype=np.int64)
+        last = self.last_timestamp(symbol, interval)
+        keep = timestamps >= last if last is not None else np.ones(len(timestamps), dtype=bool)
+        if not keep.any():
+            return 0
+
+        directory = self._symbol_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        existing = self.load(symbol, interval, mmap=False) or {}
+        # Cached bars from the first written timestamp on are superseded
+        retained = int(np.searchsorted(existing["timestamp"], timestamps[keep][0])) if existing else 0
+
+        # The timestamp column goes last: it defines the cached tail, so an
+        # interrupted write never marks bars as cached that are missing
+        for field in PRICE_FIELDS + ("timestamp",):
+            dtype = np.int64 if field == "timestamp" else np.float64
+            new_values = np.asarray(bars[field], dtype=dtype)[keep]
+            if field in existing:
+                new_values = np.concatenate([existing[field][:retained], new_values])
+            path = self._path(symbol, interval, field)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, new_values)
+            os.replace(tmp_path, path)
+        return int((timestamps > last).sum()) if last is not None else int(keep.sum())
+
+    def drop(self, symbol: str, interval: str):
+        """Forget a symbol's cached bars (e.g. after a split or dividend re-adjusts its history)"""
+        shutil.rmtree(self._symbol_dir(symbol, interval), ignore_errors=True)
+
+    def load_panel(self, symbols: List[str], interval: str, field: str = "close"):
+        """
+        One field for many symbols as a (timestamps, symbols, values) panel:
+        values is a time x symbol float array on the union of the cached
+        timestamps, with NaN where a symbol has no bar
+        """
+        series = {}
+        for symbol in symbols:
+            columns = self.load(symbol, interval, fields=[field])
+            if columns is not None and len(columns["timestamp"]):
+                series[symbol.upper()] = columns
+        if not series:
+            return np.empty(0, dtype=np.int64), [], np.empty((0, 0))
+
+        timestamps = np.unique(np.concatenate([columns["timestamp"] for columns in series.values()]))
+        values = np.full((len(timestamps), len(series)), np.nan)
+        for position, columns in enumerate(series.values()):
+            rows = np.searchsorted(timestamps, columns["timestamp"])
+            values[rows, position] = columns[field]
+        return timestamps, list(series), values
@@ -0,0 +1,148 @@
+"""
+Sentiment vs. forward returns
+Bins per-symbol article sentiment onto the bars of a price panel and measures
+how well it lines up with the returns that follow: cross-sectional rank
+information coefficients (IC) per bar, their summary statistics, a pooled
+correlation and rolling per-symbol correlations. Every step works on whole
+time x symbol arrays, so a universe-wide run is a handful of NumPy/pandas
+operations rather than a loop over symbols or dates.
+
+Scores can come from any scorer (the yfinance headline lexicon,
+SpacyFinancialNLP.analyze_text, ...) as (symbol, timestamp, score) arrays.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = None
+    pd = None
+
+DEFAULT_HORIZONS = (1, 5, 20)
+
+
+def bucket_sentiment(timestamps, symbols: List[str], obs_symbols, obs_times, obs_scores) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Mean score and article count per (bar, symbol). An article is assigned to
+    the first bar stamped at or after its publication time, so a bar's
+    sentiment only uses news available by then (no lookahead). Articles for
+    unknown symbols or after the last bar are dropped.
+    """
+    timestamps = np.asarray(timestamps)
+    shape = (len(timestamps), len(symbols))
+    if not len(obs_scores) or not len(timestamps):
+        return np.full(shape, np.nan), np.zeros(shape)
+
+    rows = np.searchsorted(timestamps, np.asarray(obs_times, dtype="float64"), side="left")
+    columns = pd.Index(symbols).get_indexer(np.asarray(obs_symbols, dtype=object))
+    keep = (rows < len(timestamps)) & (columns >= 0)
+    cells = rows[keep] * len(symbols) + columns[keep]
+
+    size = shape[0] * shape[1]
+    totals = np.bincount(cells, weights=np.asarray(obs_scores, dtype="float64")[keep], minlength=size)
+    counts = np.bincount(cells, minlength=size).astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, totals / counts, np.nan)
+    return means.reshape(shape), counts.reshape(shape)
+
+
+def forward_returns(closes, horizons: Iterable[int] = DEFAULT_HORIZONS) -> Dict[int, "np.ndarray"]:
+    """Simple return from each bar's close to the close `h` bars later (NaN past the end)"""
+    closes = np.asarray(closes, dtype="float64")
+    returns = {}
+    for horizon in horizons:
+        forward = np.full(closes.shape, np.nan)
+        if horizon < len(closes):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                forward[:-horizon] = closes[horizon:] / closes[:-horizon] - 1
+        returns[horizon] = forward
+    return returns
+
+
+def row_correlation(x, y, min_count: int = 3) -> "np.ndarray":
+    """Pearson correlation of each row of x with the same row of y over jointly valid cells"""
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.where(valid, x, 0).sum(axis=1) / n
+        y_mean = np.where(valid, y, 0).sum(axis=1) / n
+        dx = np.where(valid, x - x_mean[:, None], 0)
+        dy = np.where(valid, y - y_mean[:, None], 0)
+        correlation = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+    correlation[(n < min_count) | ~np.isfinite(correlation)] = np.nan
+    return correlation
+
+
+def rank_ic(sentiment, forward, min_symbols: int = 5) -> "np.ndarray":
+    """Cross-sectional Spearman IC per bar: ranks are taken over symbols valid in both"""
+    valid = ~np.isnan(sentiment) & ~np.isnan(forward)
+    sentiment_ranks = pd.DataFrame(np.where(valid, sentiment, np.nan)).rank(axis=1).to_numpy()
+    forward_ranks = pd.DataFrame(np.where(valid, forward, np.nan)).rank(axis=1).to_numpy()
+    return row_correlation(sentiment_ranks, forward_ranks, min_count=min_symbols)
+
+
+def rolling_correlation(sentiment, forward, window: int = 60, min_periods: int = 10) -> "np.ndarray":
+    """Per-symbol time-series correlation over a trailing window of bars, using bars with news"""
+    sentiment = pd.DataFrame(sentiment)
+    return sentiment.rolling(window, min_periods=min_periods).corr(pd.DataFrame(forward)).to_numpy()
+
+
+def summarize_ic(ic) -> Dict[str, Any]:
+    """Mean, dispersion, information ratio, t-stat and hit rate of an IC series"""
+    ic = ic[~np.isnan(ic)]
+    if len(ic) < 2:
+        return {"periods": int(len(ic)), "mean_ic": float(ic[0]) if len(ic) else None}
+    mean = float(ic.mean())
+    std = float(ic.std(ddof=1))
+    ir = mean / std if std > 0 else None
+    return {
+        "periods": int(len(ic)),
+        "mean_ic": round(mean, 6),
+        "ic_std": round(std, 6),
+        "ic_ir": round(ir, 6) if ir is not None else None,
+        "t_stat": round(float(ir * np.sqrt(len(ic))), 4) if ir is not None else None,
+        "hit_rate": round(float((ic > 0).mean()), 4)
+    }
+
+
+def correlate_sentiment(timestamps, symbols: List[str], closes, observations: List[tuple],
+                        horizons: Iterable[int] = DEFAULT_HORIZONS, window: int = 60,
+                        min_symbols: int = 5) -> Dict[str, Any]:
+    """
+    Full report for a close-price panel (time x symbol, aligned to timestamps)
+    and (symbol, timestamp, score) observations
+    """
+    if np is None:
+        raise RuntimeError("NumPy and pandas are required for sentiment correlation. Run: pip install numpy pandas")
+
+    if observations:
+        obs_symbols, obs_times, obs_scores = (np.asarray(column) for column in zip(*observations))
+    else:
+        obs_symbols, obs_times, obs_scores = np.empty(0, dtype=object), np.empty(0), np.empty(0)
+    sentiment, counts = bucket_sentiment(timestamps, symbols, obs_symbols, obs_times, obs_scores)
+
+    report = {
+        "bars": int(len(timestamps)),
+        "symbols": len(symbols),
+        "articles": int(counts.sum()),
+        "bars_with_news": int((counts.sum(axis=1) > 0).sum()),
+        "horizons": {}
+    }
+    for horizon, forward in forward_returns(closes, horizons).items():
+        ic = rank_ic(sentiment, forward, min_symbols=min_symbols)
+        valid = ~np.isnan(sentiment) & ~np.isnan(forward)
+        pooled = row_correlation(sentiment[valid][None, :], forward[valid][None, :])[0] if valid.any() else np.nan
+        rolling = rolling_correlation(sentiment, forward, window=window)
+        latest = pd.DataFrame(rolling, columns=symbols).ffill().iloc[-1] if len(rolling) else pd.Series(dtype="float64")
+
+        report["horizons"][str(horizon)] = {
+            **summarize_ic(ic),
+            "pooled_correlation": None if np.isnan(pooled) else round(float(pooled), 6),
+            "observations": int(valid.sum()),
+            "rolling_correlation": {
+                symbol: round(float(value), 6) for symbol, value in latest.items() if not np.isnan(value)
+            }
+        }
+    return report
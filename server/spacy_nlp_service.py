@@ -4,14 +4,23 @@ Advanced spaCy NLP Service for Financial Sentiment Analysis
 Integrates spaCy's industrial-strength NLP with financial domain expertise
 """
 
+import os
 import sys
 import json
-from typing import Dict, List, Any, Optional
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Iterator, Optional
 from datetime import datetime
 
+from sqlite_utils import open_sqlite
+
 # Try to load spaCy model, use fallback if not available
 try:
     import spacy
+    from spacy.matcher import PhraseMatcher
+    from spacy.tokens import DocBin
     nlp = spacy.load("en_core_web_sm")
     SPACY_AVAILABLE = True
 except (OSError, ImportError, ModuleNotFoundError):
@@ -24,9 +33,198 @@ except (OSError, ImportError, ModuleNotFoundError):
         nlp = None
         SPACY_AVAILABLE = False
 
+# NumPy powers the vectorized corpus scorer; it is optional like spaCy
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Analysis profiles: the pipeline components each profile needs. Everything
+# else is disabled for the call. None means the full pipeline.
+PIPELINE_PROFILES = {
+    "fast": set(),           # tokenizer + lexicon scoring, for headlines
+    "entities": {"ner"},     # named entities without tagger/parser
+    "full": None,            # tagger, parser, NER, lemmatizer, attribute ruler
+}
+DEFAULT_PROFILE = "full"
+
+# Context word lists used by the spaCy feature extractor
+DIRECTION_UP_WORDS = frozenset({"up", "rise", "gain", "increase", "surge", "rally", "bull", "growth"})
+DIRECTION_DOWN_WORDS = frozenset({"down", "fall", "drop", "decline", "crash", "bear", "loss", "plunge"})
+RISK_WORDS = frozenset({"risk", "volatile", "uncertainty", "crisis", "bubble", "correction"})
+PERFORMANCE_WORDS = frozenset({"earnings", "revenue", "profit", "margin", "yield", "return", "dividend"})
+NEGATION_WORDS = frozenset({"not", "no", "never", "nothing", "none"})
+INTENSITY_WORDS = frozenset({"very", "extremely", "highly", "significantly", "substantially"})
+
+# Smaller word lists used by the lexicon-only fallback analysis
+FALLBACK_RISK_WORDS = frozenset({"risk", "volatile", "crisis"})
+FALLBACK_PERFORMANCE_WORDS = frozenset({"earnings", "profit", "revenue"})
+FALLBACK_INTENSITY_WORDS = frozenset({"very", "extremely", "highly"})
+FALLBACK_NEGATION_WORDS = frozenset({"not", "no", "never"})
+
+# Multi-token spellings of single-word lexicon entries
+FINANCIAL_PHRASES = {
+    "positive": ["break out", "up trend", "out-perform"],
+    "negative": ["sell off", "sell-off", "down trend", "under-perform"],
+}
+
+ENTITY_BUCKETS = {
+    "ORG": "organizations",
+    "CORP": "organizations",
+    "PERSON": "persons",
+    "MONEY": "money",
+    "DATE": "dates",
+    "TIME": "dates",
+    "GPE": "locations",
+    "LOC": "locations",
+}
+
+# Bit flags stored per lowercase lexeme hash in the lexicon index
+FLAG_POSITIVE = 1 << 0
+FLAG_NEGATIVE = 1 << 1
+FLAG_MARKET_ENTITY = 1 << 2
+FLAG_DIRECTION_UP = 1 << 3
+FLAG_DIRECTION_DOWN = 1 << 4
+FLAG_RISK = 1 << 5
+FLAG_PERFORMANCE = 1 << 6
+FLAG_NEGATION = 1 << 7
+FLAG_INTENSITY = 1 << 8
+FLAG_QUESTION = 1 << 9
+FLAG_EXCLAMATION = 1 << 10
+
+# Bump when _calculate_sentiment_score or the result layout changes so cached
+# results from an older scorer are not served
+ANALYSIS_VERSION = "1"
+
+class AnalysisCache:
+    """
+    Content-addressed cache of analysis results: a bounded in-memory LRU with
+    an optional SQLite tier that survives restarts. Results are stored as
+    JSON strings so callers always get an independent copy. The SQLite tier
+    keeps at most max_disk_entries rows, dropping the oldest first.
+    """
+
+    # Trim the SQLite tier back to max_disk_entries once every this many writes
+    TRIM_INTERVAL = 1000
+
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None,
+                 max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.path = path
+        self.writes_since_trim = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self.db = None
+
+        if path:
+            self.db = open_sqlite(path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_cache_created ON analysis_cache (created_at)"
+            )
+            self.db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["AnalysisCache"]:
+        """Build the cache from SPACY_NLP_CACHE_SIZE / SPACY_NLP_CACHE_PATH / SPACY_NLP_CACHE_DISK_SIZE"""
+        max_entries = int(os.environ.get("SPACY_NLP_CACHE_SIZE", "4096"))
+        path = os.environ.get("SPACY_NLP_CACHE_PATH") or None
+        max_disk_entries = int(os.environ.get("SPACY_NLP_CACHE_DISK_SIZE", "100000"))
+        if max_entries <= 0 and not path:
+            return None
+        return cls(max_entries=max_entries, path=path, max_disk_entries=max_disk_entries)
+
+    @staticmethod
+    def make_key(text: str, lexicon_version: str, profile: str) -> str:
+        """Cache key from the text hash, lexicon version and pipeline profile"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{lexicon_version}:{profile}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return json.loads(payload)
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT payload FROM analysis_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[0])
+                    return json.loads(row[0])
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        payload = json.dumps(result)
+        with self.lock:
+            self._remember(key, payload)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, payload, created_at) VALUES (?, ?, ?)",
+                    (key, payload, time.time())
+                )
+                self.writes_since_trim += 1
+                if self.writes_since_trim >= self.TRIM_INTERVAL:
+                    self._trim_disk()
+                self.db.commit()
+
+    def prune(self, lexicon_version: str) -> int:
+        """Delete disk entries written under any other lexicon version, then trim to size"""
+        if self.db is None:
+            return 0
+        prefix = f"{lexicon_version}:"
+        with self.lock:
+            deleted = self.db.execute(
+                "DELETE FROM analysis_cache WHERE substr(key, 1, ?) != ?", (len(prefix), prefix)
+            ).rowcount
+            self._trim_disk()
+            self.db.commit()
+        return deleted
+
+    def _trim_disk(self):
+        """Drop the oldest disk entries beyond max_disk_entries (caller holds the lock)"""
+        self.writes_since_trim = 0
+        self.db.execute(
+            "DELETE FROM analysis_cache WHERE key IN ("
+            "SELECT key FROM analysis_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (max(self.max_disk_entries, 0),)
+        )
+
+    def _remember(self, key: str, payload: str):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = payload
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "disk_path": self.path
+            }
+
 class SpacyFinancialNLP:
-    def __init__(self):
+    def __init__(self, cache: Optional[AnalysisCache] = None):
         self.nlp = nlp
+        self.disabled_components = self._resolve_profiles()
+        self.cache = cache if cache is not None else AnalysisCache.from_env()
         
         # Financial domain lexicons with sentiment weights
         self.financial_positive = {
@@ -53,25 +251,222 @@ class SpacyFinancialNLP:
             'portfolio', 'investment', 'trading', 'market', 'exchange'
         }
 
-    def analyze_text(self, text: str) -> Dict[str, Any]:
+        self._build_lexicon_index()
+        self.lexicon_version = self._compute_lexicon_version()
+        if self.cache is not None:
+            # Results from older lexicons can never be hit again
+            self.cache.prune(self.lexicon_version)
+
+    def _resolve_profiles(self) -> Dict[str, List[str]]:
+        """Work out which loaded pipeline components each profile disables"""
+        if self.nlp is None:
+            return {name: [] for name in PIPELINE_PROFILES}
+
+        # Components that listen to the shared tok2vec need it kept enabled
+        listeners = set()
+        if "tok2vec" in self.nlp.pipe_names:
+            listeners = set(getattr(self.nlp.get_pipe("tok2vec"), "listening_components", []))
+
+        disabled = {}
+        for name, needed in PIPELINE_PROFILES.items():
+            if needed is None:
+                disabled[name] = []
+                continue
+            keep = set(needed)
+            if keep & listeners:
+                keep.add("tok2vec")
+            disabled[name] = [pipe for pipe in self.nlp.pipe_names if pipe not in keep]
+        return disabled
+
+    def _compute_lexicon_version(self) -> str:
+        """Fingerprint of everything that affects a result besides the text"""
+        fingerprint = json.dumps({
+            "analysis": ANALYSIS_VERSION,
+            "model": f"{self.nlp.meta.get('name')}-{self.nlp.meta.get('version')}" if self.nlp else None,
+            "positive": sorted(self.financial_positive),
+            "negative": sorted(self.financial_negative),
+            "entities": sorted(self.market_entities),
+            "phrases": FINANCIAL_PHRASES,
+            "direction_up": sorted(DIRECTION_UP_WORDS),
+            "direction_down": sorted(DIRECTION_DOWN_WORDS),
+            "risk": sorted(RISK_WORDS),
+            "performance": sorted(PERFORMANCE_WORDS),
+            "negation": sorted(NEGATION_WORDS),
+            "intensity": sorted(INTENSITY_WORDS),
+            "fallback_risk": sorted(FALLBACK_RISK_WORDS),
+            "fallback_performance": sorted(FALLBACK_PERFORMANCE_WORDS),
+            "fallback_intensity": sorted(FALLBACK_INTENSITY_WORDS),
+            "fallback_negation": sorted(FALLBACK_NEGATION_WORDS),
+            "entity_buckets": ENTITY_BUCKETS,
+        }, sort_keys=True)
+        return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+    def _cache_key(self, text: str, profile: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return AnalysisCache.make_key(text, self.lexicon_version, profile)
+
+    def _cached(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Look up a cached result and mark it as a cache hit, stamped with the current time"""
+        if key is None:
+            return None
+        result = self.cache.get(key)
+        if result is not None:
+            metadata = result["metadata"]
+            metadata["cache"] = "hit"
+            metadata["cached_at"] = metadata.get("timestamp")
+            metadata["timestamp"] = datetime.now().isoformat()
+        return result
+
+    def _store(self, key: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        if key is not None:
+            self.cache.put(key, result)
+            result["metadata"]["cache"] = "miss"
+        return result
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters for the result cache"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "lexicon_version": self.lexicon_version, **self.cache.get_stats()}
+
+    def analyze_text(self, text: str, profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
         """
         Comprehensive NLP analysis using spaCy with financial domain expertise
         """
+        if profile not in PIPELINE_PROFILES:
+            raise ValueError(f"Unknown analysis profile: {profile}")
+
         if not text or len(text.strip()) == 0:
-            return self._get_default_result()
+            return self._get_default_result(profile)
         
         # Check if spaCy is available
         if not SPACY_AVAILABLE or self.nlp is None:
             return self._get_fallback_analysis(text)
         
-        # Process text with spaCy
-        doc = self.nlp(text)
+        key = self._cache_key(text, profile)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
         
-        # Extract linguistic features
-        entities = self._extract_entities(doc)
-        sentiment_features = self._analyze_sentiment_features(doc)
-        linguistic_features = self._extract_linguistic_features(doc)
-        financial_context = self._analyze_financial_context(doc)
+        # Process text with spaCy, running only the profile's components
+        doc = self.nlp(text, disable=self.disabled_components[profile])
+        return self._store(key, self._analyze_doc(doc, text, profile))
+
+    def analyze_many(self, texts: Iterable[str], batch_size: int = 64,
+                     profile: str = DEFAULT_PROFILE) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze a stream of texts, yielding one result per text in input order.
+        Texts are parsed through nlp.pipe in batches; each result matches what
+        analyze_text would return for the same text.
+        """
+        if profile not in PIPELINE_PROFILES:
+            raise ValueError(f"Unknown analysis profile: {profile}")
+
+        if not SPACY_AVAILABLE or self.nlp is None:
+            for text in texts:
+                yield self.analyze_text(text, profile)
+            return
+
+        def stream():
+            # Empty texts and cache hits still flow through the pipe (as empty
+            # strings) so ordering is preserved without re-parsing them
+            for text in texts:
+                if not text or len(text.strip()) == 0:
+                    yield "", (text, None, None)
+                    continue
+                key = self._cache_key(text, profile)
+                cached = self._cached(key)
+                if cached is not None:
+                    yield "", (text, key, cached)
+                else:
+                    yield text, (text, key, None)
+
+        docs = self.nlp.pipe(stream(), as_tuples=True, batch_size=batch_size,
+                             disable=self.disabled_components[profile])
+        for doc, (text, key, cached) in docs:
+            if cached is not None:
+                yield cached
+            elif not text or len(text.strip()) == 0:
+                yield self._get_default_result(profile)
+            else:
+                yield self._store(key, self._analyze_doc(doc, text, profile))
+
+    def parse_to_docbin(self, texts: Iterable[str], out_dir: str, shard_size: int = 10000,
+                        batch_size: int = 256, profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+        """
+        Parse texts once and persist the Docs as DocBin shards in out_dir, so
+        lexicon or scoring changes can be re-applied with rescore_docbin()
+        without paying for the spaCy parse again
+        """
+        if not SPACY_AVAILABLE or self.nlp is None:
+            raise RuntimeError("spaCy model not available - cannot store parsed documents")
+        if profile not in PIPELINE_PROFILES:
+            raise ValueError(f"Unknown analysis profile: {profile}")
+
+        os.makedirs(out_dir, exist_ok=True)
+        shards = []
+        count = 0
+        doc_bin = DocBin()
+
+        def flush():
+            name = f"docs-{len(shards):05d}.spacy"
+            doc_bin.to_disk(os.path.join(out_dir, name))
+            shards.append(name)
+
+        docs = self.nlp.pipe((text or "" for text in texts), batch_size=batch_size,
+                             disable=self.disabled_components[profile])
+        for doc in docs:
+            doc_bin.add(doc)
+            count += 1
+            if len(doc_bin) >= shard_size:
+                flush()
+                doc_bin = DocBin()
+        if len(doc_bin) or not shards:
+            flush()
+
+        manifest = {
+            "profile": profile,
+            "model": f"{self.nlp.meta.get('name')}-{self.nlp.meta.get('version')}",
+            "spacy_version": spacy.__version__,
+            "count": count,
+            "shards": shards,
+            "created_at": datetime.now().isoformat()
+        }
+        with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def rescore_docbin(self, in_dir: str) -> Iterator[Dict[str, Any]]:
+        """
+        Re-run feature extraction and scoring with the current lexicons over
+        Docs stored by parse_to_docbin(), one shard in memory at a time
+        """
+        if not SPACY_AVAILABLE or self.nlp is None:
+            raise RuntimeError("spaCy model not available - cannot load parsed documents")
+
+        manifest_path = os.path.join(in_dir, "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            profile = manifest.get("profile", DEFAULT_PROFILE)
+            shards = list(manifest["shards"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise RuntimeError(f"Corrupt DocBin manifest {manifest_path}: {e}")
+
+        for name in shards:
+            doc_bin = DocBin().from_disk(os.path.join(in_dir, name))
+            for doc in doc_bin.get_docs(self.nlp.vocab):
+                if len(doc.text.strip()) == 0:
+                    yield self._get_default_result(profile)
+                else:
+                    yield self._analyze_doc(doc, doc.text, profile)
+
+    def _analyze_doc(self, doc, text: str, profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+        """Run feature extraction and scoring on an already-parsed Doc"""
+        # Extract linguistic features in a single pass over the Doc
+        entities, sentiment_features, linguistic_features, financial_context = \
+            self._extract_features(doc)
         
         # Calculate composite sentiment score
         sentiment_score = self._calculate_sentiment_score(
@@ -94,12 +489,53 @@ class SpacyFinancialNLP:
                 "text_length": len(text),
                 "processed_tokens": len(doc),
                 "timestamp": datetime.now().isoformat(),
-                "model_version": spacy.__version__
+                "model_version": spacy.__version__,
+                "profile": profile
             }
         }
 
-    def _extract_entities(self, doc) -> Dict[str, List[str]]:
-        """Extract and categorize named entities"""
+    def _build_lexicon_index(self):
+        """
+        Precompute a lowercase-hash -> feature-flag table and a PhraseMatcher
+        so feature extraction is a single pass of integer lookups
+        """
+        self.lexicon_index = {}
+        self.phrase_matcher = None
+        if self.nlp is None:
+            return
+
+        strings = self.nlp.vocab.strings
+        lexicons = [
+            (self.financial_positive, FLAG_POSITIVE),
+            (self.financial_negative, FLAG_NEGATIVE),
+            (self.market_entities, FLAG_MARKET_ENTITY),
+            (DIRECTION_UP_WORDS, FLAG_DIRECTION_UP),
+            (DIRECTION_DOWN_WORDS, FLAG_DIRECTION_DOWN),
+            (RISK_WORDS, FLAG_RISK),
+            (PERFORMANCE_WORDS, FLAG_PERFORMANCE),
+            (NEGATION_WORDS, FLAG_NEGATION),
+            (INTENSITY_WORDS, FLAG_INTENSITY),
+            ({"?"}, FLAG_QUESTION),
+            ({"!"}, FLAG_EXCLAMATION),
+        ]
+        for words, flag in lexicons:
+            for word in words:
+                key = strings.add(word)
+                self.lexicon_index[key] = self.lexicon_index.get(key, 0) | flag
+
+        self.neg_dep = strings.add("neg")
+
+        # Multi-word spellings of lexicon entries ("sell-off", "break out")
+        self.phrase_matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        for label, phrases in FINANCIAL_PHRASES.items():
+            self.phrase_matcher.add(label, [self.nlp.make_doc(phrase) for phrase in phrases])
+        self.phrase_labels = {strings.add(label): label for label in FINANCIAL_PHRASES}
+
+    def _extract_features(self, doc):
+        """
+        Fused feature extraction: visit every token once and fill the
+        entities, sentiment, linguistic and financial-context structures
+        """
         entities = {
             "organizations": [],
             "persons": [],
@@ -108,62 +544,98 @@ class SpacyFinancialNLP:
             "locations": [],
             "financial_instruments": []
         }
-        
         for ent in doc.ents:
-            if ent.label_ in ["ORG", "CORP"]:
-                entities["organizations"].append(ent.text)
-            elif ent.label_ == "PERSON":
-                entities["persons"].append(ent.text)
-            elif ent.label_ == "MONEY":
-                entities["money"].append(ent.text)
-            elif ent.label_ in ["DATE", "TIME"]:
-                entities["dates"].append(ent.text)
-            elif ent.label_ in ["GPE", "LOC"]:
-                entities["locations"].append(ent.text)
-        
-        # Identify financial instruments
-        for token in doc:
-            if token.text.lower() in self.market_entities:
-                entities["financial_instruments"].append(token.text)
-        
-        return entities
-
-    def _analyze_sentiment_features(self, doc) -> Dict[str, Any]:
-        """Analyze sentiment-related features"""
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        intensity_modifiers = 0
-        negations = 0
-        
+            bucket = ENTITY_BUCKETS.get(ent.label_)
+            if bucket:
+                entities[bucket].append(ent.text)
+
+        positive_count = negative_count = neutral_count = 0
+        intensity_modifiers = negations = 0
         positive_words = []
         negative_words = []
-        
+
+        question_count = exclamation_count = capitalized_words = 0
+        sentence_count = 0
+        pos_ids = {}
+
+        financial_entities_count = 0
+        direction_indicators = []
+        risk_indicators = []
+        performance_indicators = []
+
+        has_sentences = doc.has_annotation("SENT_START")
+        has_pos = doc.has_annotation("POS")
+        index = self.lexicon_index
+        neg_dep = self.neg_dep
+        financial_instruments = entities["financial_instruments"]
+
+        # Multi-word phrases count once, in place of their individual tokens
+        phrase_tokens = set()
+        for match_id, start, end in self.phrase_matcher(doc):
+            phrase_tokens.update(range(start, end))
+            span_text = doc[start:end].text
+            if self.phrase_labels[match_id] == "positive":
+                positive_count += 1
+                positive_words.append(span_text)
+            else:
+                negative_count += 1
+                negative_words.append(span_text)
+
         for token in doc:
-            token_lower = token.text.lower()
-            
-            # Count negations
-            if token.dep_ == "neg" or token_lower in ["not", "no", "never", "nothing", "none"]:
+            flags = index.get(token.lower, 0)
+
+            if has_sentences and token.is_sent_start:
+                sentence_count += 1
+            if has_pos:
+                pos_ids[token.pos] = pos_ids.get(token.pos, 0) + 1
+
+            if flags & FLAG_QUESTION:
+                question_count += 1
+            elif flags & FLAG_EXCLAMATION:
+                exclamation_count += 1
+            elif token.is_upper and len(token) > 1:
+                capitalized_words += 1
+
+            if token.dep == neg_dep or flags & FLAG_NEGATION:
                 negations += 1
-            
-            # Count intensity modifiers
-            if token_lower in ["very", "extremely", "highly", "significantly", "substantially"]:
+            if token.i in phrase_tokens:
+                continue
+            if not flags:
+                neutral_count += 1
+                continue
+
+            if flags & FLAG_INTENSITY:
                 intensity_modifiers += 1
-            
-            # Financial sentiment analysis
-            if token_lower in self.financial_positive:
+
+            if flags & FLAG_POSITIVE:
                 positive_count += 1
                 positive_words.append(token.text)
-            elif token_lower in self.financial_negative:
+            elif flags & FLAG_NEGATIVE:
                 negative_count += 1
                 negative_words.append(token.text)
             else:
                 neutral_count += 1
-        
+
+            if flags & FLAG_MARKET_ENTITY:
+                financial_entities_count += 1
+                financial_instruments.append(token.text)
+            if flags & FLAG_DIRECTION_UP:
+                direction_indicators.append(("positive", token.text))
+            elif flags & FLAG_DIRECTION_DOWN:
+                direction_indicators.append(("negative", token.text))
+            if flags & FLAG_RISK:
+                risk_indicators.append(token.text)
+            if flags & FLAG_PERFORMANCE:
+                performance_indicators.append(token.text)
+
+        if not has_sentences:
+            # No parser/senter: treat the whole doc as one sentence
+            sentence_count = 1 if len(doc) else 0
+
         total_sentiment_words = positive_count + negative_count
         confidence = min(total_sentiment_words / max(len(doc), 1) * 2, 1.0)
-        
-        return {
+
+        sentiment_features = {
             "positive_count": positive_count,
             "negative_count": negative_count,
             "neutral_count": neutral_count,
@@ -174,80 +646,26 @@ class SpacyFinancialNLP:
             "confidence": confidence
         }
 
-    def _extract_linguistic_features(self, doc) -> Dict[str, Any]:
-        """Extract linguistic and structural features"""
-        features = {
-            "sentence_count": len(list(doc.sents)),
-            "avg_sentence_length": 0,
-            "question_count": 0,
-            "exclamation_count": 0,
-            "capitalized_words": 0,
-            "pos_distribution": {},
+        strings = doc.vocab.strings
+        linguistic_features = {
+            "sentence_count": sentence_count,
+            "avg_sentence_length": len(doc) / sentence_count if sentence_count else 0,
+            "question_count": question_count,
+            "exclamation_count": exclamation_count,
+            "capitalized_words": capitalized_words,
+            "pos_distribution": {strings[pos]: count for pos, count in pos_ids.items()},
             "dependency_features": {}
         }
-        
-        # Calculate average sentence length
-        sentences = list(doc.sents)
-        if sentences:
-            features["avg_sentence_length"] = sum(len(sent) for sent in sentences) / len(sentences)
-        
-        # Count punctuation patterns
-        for token in doc:
-            if token.text == "?":
-                features["question_count"] += 1
-            elif token.text == "!":
-                features["exclamation_count"] += 1
-            elif token.text.isupper() and len(token.text) > 1:
-                features["capitalized_words"] += 1
-        
-        # POS tag distribution
-        pos_counts = {}
-        for token in doc:
-            pos = token.pos_
-            pos_counts[pos] = pos_counts.get(pos, 0) + 1
-        
-        features["pos_distribution"] = pos_counts
-        
-        return features
-
-    def _analyze_financial_context(self, doc) -> Dict[str, Any]:
-        """Analyze financial domain-specific context"""
-        context = {
-            "financial_entities_count": 0,
-            "market_direction_indicators": [],
-            "risk_indicators": [],
-            "performance_indicators": [],
+
+        financial_context = {
+            "financial_entities_count": financial_entities_count,
+            "market_direction_indicators": direction_indicators,
+            "risk_indicators": risk_indicators,
+            "performance_indicators": performance_indicators,
             "temporal_indicators": []
         }
-        
-        # Market direction indicators
-        direction_up = {"up", "rise", "gain", "increase", "surge", "rally", "bull", "growth"}
-        direction_down = {"down", "fall", "drop", "decline", "crash", "bear", "loss", "plunge"}
-        
-        # Risk indicators
-        risk_words = {"risk", "volatile", "uncertainty", "crisis", "bubble", "correction"}
-        
-        # Performance indicators
-        performance_words = {"earnings", "revenue", "profit", "margin", "yield", "return", "dividend"}
-        
-        for token in doc:
-            token_lower = token.text.lower()
-            
-            if token_lower in self.market_entities:
-                context["financial_entities_count"] += 1
-            
-            if token_lower in direction_up:
-                context["market_direction_indicators"].append(("positive", token.text))
-            elif token_lower in direction_down:
-                context["market_direction_indicators"].append(("negative", token.text))
-            
-            if token_lower in risk_words:
-                context["risk_indicators"].append(token.text)
-            
-            if token_lower in performance_words:
-                context["performance_indicators"].append(token.text)
-        
-        return context
+
+        return entities, sentiment_features, linguistic_features, financial_context
 
     def _calculate_sentiment_score(self, sentiment_features: Dict, financial_context: Dict, linguistic_features: Dict) -> float:
         """Calculate composite sentiment score (0-100 scale)"""
@@ -288,7 +706,7 @@ class SpacyFinancialNLP:
         else:
             return "neutral"
 
-    def _get_default_result(self) -> Dict[str, Any]:
+    def _get_default_result(self, profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
         """Return default result for empty input"""
         return {
             "status": "success",
@@ -306,7 +724,8 @@ class SpacyFinancialNLP:
                 "text_length": 0,
                 "processed_tokens": 0,
                 "timestamp": datetime.now().isoformat(),
-                "model_version": "fallback"
+                "model_version": "fallback",
+                "profile": profile
             }
         }
 
@@ -340,8 +759,8 @@ class SpacyFinancialNLP:
                 "financial_context": {
                     "financial_entities_count": len([w for w in words if w in self.market_entities]),
                     "market_direction_indicators": [],
-                    "risk_indicators": [word for word in words if word in {"risk", "volatile", "crisis"}],
-                    "performance_indicators": [word for word in words if word in {"earnings", "profit", "revenue"}],
+                    "risk_indicators": [word for word in words if word in FALLBACK_RISK_WORDS],
+                    "performance_indicators": [word for word in words if word in FALLBACK_PERFORMANCE_WORDS],
                     "temporal_indicators": []
                 },
                 "linguistic_features": {
@@ -359,8 +778,8 @@ class SpacyFinancialNLP:
                     "neutral_count": len(words) - positive_count - negative_count,
                     "positive_words": [w for w in words if w in self.financial_positive],
                     "negative_words": [w for w in words if w in self.financial_negative],
-                    "intensity_modifiers": len([w for w in words if w in ["very", "extremely", "highly"]]),
-                    "negations": len([w for w in words if w in ["not", "no", "never"]]),
+                    "intensity_modifiers": len([w for w in words if w in FALLBACK_INTENSITY_WORDS]),
+                    "negations": len([w for w in words if w in FALLBACK_NEGATION_WORDS]),
                     "confidence": min(0.8, (positive_count + negative_count) / max(len(words), 1))
                 }
             },
@@ -373,20 +792,104 @@ class SpacyFinancialNLP:
             }
         }
 
-def analyze_sentiment(text: str):
+class VectorizedLexiconScorer:
+    """
+    Corpus-scale version of the fallback lexicon scorer. Texts are tokenized
+    like _get_fallback_analysis, mapped to integer ids over a fixed vocabulary
+    of lexicon words (id 0 = out of vocabulary) and laid out as a CSR token
+    matrix; per-category counts for the whole batch are then one sparse
+    matrix-vector product (np.bincount over the row index) per category.
+    """
+
+    CATEGORIES = ("positive", "negative", "market_entities", "risk",
+                  "performance", "intensity_modifiers", "negations")
+
+    def __init__(self, analyzer: SpacyFinancialNLP):
+        if np is None:
+            raise RuntimeError("NumPy is required for vectorized scoring. Run: pip install numpy")
+
+        lexicons = (
+            analyzer.financial_positive,
+            analyzer.financial_negative,
+            analyzer.market_entities,
+            FALLBACK_RISK_WORDS,
+            FALLBACK_PERFORMANCE_WORDS,
+            FALLBACK_INTENSITY_WORDS,
+            FALLBACK_NEGATION_WORDS,
+        )
+        vocabulary = sorted(set().union(*lexicons))
+        self.token_ids = {word: idx for idx, word in enumerate(vocabulary, start=1)}
+
+        # (vocabulary + OOV) x categories indicator matrix
+        self.weights = np.zeros((len(vocabulary) + 1, len(self.CATEGORIES)), dtype=np.float64)
+        for column, words in enumerate(lexicons):
+            for word in words:
+                self.weights[self.token_ids[word], column] = 1.0
+
+    def token_matrix(self, texts: List[str]):
+        """Return the CSR structure (indptr, token ids) for a batch of texts"""
+        get = self.token_ids.get
+        lengths = np.zeros(len(texts) + 1, dtype=np.int64)
+        ids = []
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            lengths[row + 1] = len(words)
+            ids.extend([get(word, 0) for word in words])
+        return np.cumsum(lengths), np.asarray(ids, dtype=np.int32)
+
+    def score(self, texts: List[str]) -> Dict[str, Any]:
+        """Score a batch of texts; returns one NumPy array per output field"""
+        n = len(texts)
+        indptr, ids = self.token_matrix(texts)
+        tokens = np.diff(indptr)
+        rows = np.repeat(np.arange(n), tokens)
+
+        counts = {}
+        for column, name in enumerate(self.CATEGORIES):
+            counts[name] = np.bincount(rows, weights=self.weights[ids, column], minlength=n).astype(np.int64)
+
+        positive = counts["positive"]
+        negative = counts["negative"]
+        sentiment_score = np.clip(50 + (positive - negative) * 10, 0, 100).astype(np.float64)
+        confidence = np.minimum(0.8, (positive + negative) / np.maximum(tokens, 1))
+        labels = np.where(sentiment_score >= 65, "positive",
+                          np.where(sentiment_score <= 35, "negative", "neutral"))
+
+        return {
+            "sentiment_score": sentiment_score,
+            "sentiment_label": labels,
+            "confidence": confidence,
+            "tokens": tokens,
+            **counts
+        }
+
+    def iter_records(self, texts: Iterable[str], chunk_size: int = 50000) -> Iterator[Dict[str, Any]]:
+        """Score a stream of texts chunk by chunk, yielding one plain dict per text"""
+        chunk = []
+        for text in texts:
+            chunk.append(text or "")
+            if len(chunk) >= chunk_size:
+                yield from self._records(chunk)
+                chunk = []
+        if chunk:
+            yield from self._records(chunk)
+
+    def _records(self, texts: List[str]) -> Iterator[Dict[str, Any]]:
+        scores = self.score(texts)
+        columns = {name: values.tolist() for name, values in scores.items()}
+        for row in range(len(texts)):
+            yield {name: values[row] for name, values in columns.items()}
+
+def analyze_sentiment(text: str, profile: str = DEFAULT_PROFILE):
     """Main function for sentiment analysis"""
     analyzer = SpacyFinancialNLP()
-    result = analyzer.analyze_text(text)
+    result = analyzer.analyze_text(text, profile)
     print(json.dumps(result))
 
-def batch_analyze(texts: List[str]):
+def batch_analyze(texts: List[str], profile: str = DEFAULT_PROFILE):
     """Batch analysis for multiple texts"""
     analyzer = SpacyFinancialNLP()
-    results = []
-    
-    for text in texts:
-        result = analyzer.analyze_text(text)
-        results.append(result)
+    results = list(analyzer.analyze_many(texts, profile=profile))
     
     print(json.dumps({
         "status": "success",
@@ -396,6 +899,145 @@ def batch_analyze(texts: List[str]):
         "timestamp": datetime.now().isoformat()
     }))
 
+def read_texts(source: str) -> Iterator[str]:
+    """Lazily read newline-delimited texts from a file path ("-" reads stdin)"""
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            yield line.rstrip("\r\n")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def stream_batch_analyze(source: str, batch_size: int = 64, profile: str = DEFAULT_PROFILE):
+    """
+    Streaming batch analysis: read one text per line from a file or stdin and
+    write one NDJSON result per text as soon as it is scored
+    """
+    analyzer = SpacyFinancialNLP()
+    write_ndjson(analyzer.analyze_many(read_texts(source), batch_size=batch_size, profile=profile))
+
+def write_ndjson(results: Iterable[Dict[str, Any]]):
+    """Write results as NDJSON, tagging each with its position in the stream"""
+    for index, result in enumerate(results):
+        result["index"] = index
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+def invalid_profile_error(profile: str) -> Dict[str, Any]:
+    """Error payload for an unknown analysis profile"""
+    return {
+        "status": "error",
+        "error": "invalid_profile",
+        "message": f"Unknown profile '{profile}'. Available profiles: {', '.join(PIPELINE_PROFILES)}"
+    }
+
+def handle_request(analyzer: SpacyFinancialNLP, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single worker request against an already-loaded analyzer"""
+    command = request.get("command", "analyze")
+    profile = request.get("profile", DEFAULT_PROFILE)
+
+    if profile not in PIPELINE_PROFILES:
+        return invalid_profile_error(profile)
+
+    if command == "analyze":
+        text = request.get("text")
+        if not isinstance(text, str):
+            return {
+                "status": "error",
+                "error": "missing_text",
+                "message": "Please provide text to analyze"
+            }
+        return analyzer.analyze_text(text, profile)
+
+    if command == "batch":
+        texts = request.get("texts")
+        if not isinstance(texts, list):
+            return {
+                "status": "error",
+                "error": "missing_texts",
+                "message": "Please provide texts for batch analysis"
+            }
+        batch_size = request.get("batch_size", 64)
+        results = list(analyzer.analyze_many(texts, batch_size=batch_size, profile=profile))
+        return {
+            "status": "success",
+            "model": "spacy_financial_nlp_batch",
+            "results": results,
+            "count": len(results),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    if command == "stats":
+        return {
+            "status": "success",
+            "cache": analyzer.get_cache_stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    if command == "ping":
+        return {
+            "status": "success",
+            "spacy_available": SPACY_AVAILABLE and analyzer.nlp is not None,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    return {
+        "status": "error",
+        "error": "invalid_command",
+        "message": "Available worker commands: analyze, batch, stats, ping"
+    }
+
+def serve(stdin=None, stdout=None):
+    """
+    Long-lived worker mode: read newline-delimited JSON requests and write one
+    JSON response per line, echoing the request "id". The spaCy model and the
+    lexicons are loaded once for the lifetime of the process.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    analyzer = SpacyFinancialNLP()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            request = None
+            response = {
+                "status": "error",
+                "error": "invalid_json",
+                "message": f"Invalid worker request: {e}"
+            }
+
+        if request is not None:
+            request_id = request.get("id")
+            try:
+                response = handle_request(analyzer, request)
+            except ValueError as e:
+                # Bad parameters for a well-formed request (e.g. unknown profile)
+                response = {
+                    "status": "error",
+                    "error": "invalid_request",
+                    "message": str(e)
+                }
+            except Exception as e:
+                response = {
+                    "status": "error",
+                    "error": "analysis_failed",
+                    "message": str(e)
+                }
+
+        response["id"] = request_id
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print(json.dumps({
@@ -407,6 +1049,13 @@ if __name__ == "__main__":
     
     command = sys.argv[1]
     
+    # Optional trailing argument selecting the pipeline profile
+    profile_arg = 4 if command == "parse_store" else 3
+    profile = sys.argv[profile_arg] if len(sys.argv) > profile_arg else DEFAULT_PROFILE
+    if command in ("analyze", "batch", "parse_store") and profile not in PIPELINE_PROFILES:
+        print(json.dumps(invalid_profile_error(profile)))
+        sys.exit(1)
+    
     if command == "analyze":
         if len(sys.argv) < 3:
             print(json.dumps({
@@ -416,7 +1065,7 @@ if __name__ == "__main__":
             }))
             sys.exit(1)
         text = sys.argv[2]
-        analyze_sentiment(text)
+        analyze_sentiment(text, profile)
     
     elif command == "batch":
         if len(sys.argv) < 3:
@@ -427,9 +1076,17 @@ if __name__ == "__main__":
             }))
             sys.exit(1)
         
+        source = sys.argv[2]
+        
+        # "-" or a file path streams newline-delimited texts as NDJSON;
+        # anything else is treated as a JSON array of texts
+        if source == "-" or os.path.isfile(source):
+            stream_batch_analyze(source, profile=profile)
+            sys.exit(0)
+        
         try:
-            texts = json.loads(sys.argv[2])
-            batch_analyze(texts)
+            texts = json.loads(source)
+            batch_analyze(texts, profile)
         except json.JSONDecodeError:
             print(json.dumps({
                 "status": "error",
@@ -438,10 +1095,58 @@ if __name__ == "__main__":
             }))
             sys.exit(1)
     
+    elif command == "fast_batch":
+        if len(sys.argv) < 3:
+            print(json.dumps({
+                "status": "error",
+                "error": "missing_texts",
+                "message": "Please provide a file path or - for newline-delimited texts"
+            }))
+            sys.exit(1)
+        
+        try:
+            scorer = VectorizedLexiconScorer(SpacyFinancialNLP())
+        except RuntimeError as e:
+            print(json.dumps({
+                "status": "error",
+                "error": "numpy_unavailable",
+                "message": str(e)
+            }))
+            sys.exit(1)
+        write_ndjson(scorer.iter_records(read_texts(sys.argv[2])))
+    
+    elif command in ("parse_store", "rescore"):
+        required = 4 if command == "parse_store" else 3
+        if len(sys.argv) < required:
+            print(json.dumps({
+                "status": "error",
+                "error": "missing_argument",
+                "message": "Usage: parse_store <source> <out_dir> [profile] | rescore <dir>"
+            }))
+            sys.exit(1)
+        
+        analyzer = SpacyFinancialNLP()
+        try:
+            if command == "parse_store":
+                manifest = analyzer.parse_to_docbin(read_texts(sys.argv[2]), sys.argv[3], profile=profile)
+                print(json.dumps({"status": "success", "manifest": manifest}))
+            else:
+                write_ndjson(analyzer.rescore_docbin(sys.argv[2]))
+        except (RuntimeError, OSError) as e:
+            print(json.dumps({
+                "status": "error",
+                "error": "docbin_failed",
+                "message": str(e)
+            }))
+            sys.exit(1)
+    
+    elif command == "serve":
+        serve()
+    
     else:
         print(json.dumps({
             "status": "error",
             "error": "invalid_command",
-            "message": "Available commands: analyze, batch"
+            "message": "Available commands: analyze, batch, fast_batch, parse_store, rescore, serve"
         }))
         sys.exit(1)
\ No newline at end of file
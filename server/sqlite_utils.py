@@ -0,0 +1,20 @@
+"""
+SQLite helpers shared by the Python data services
+Every store is a WAL-mode database that several service processes and
+threads open at once
+"""
+
+import os
+import sqlite3
+
+
+def open_sqlite(path: str, timeout: float = 10, **kwargs) -> sqlite3.Connection:
+    """
+    Open (creating its directory if needed) a SQLite database in WAL mode,
+    usable from any thread; callers serialize access with their own lock.
+    Extra keyword arguments go to sqlite3.connect (e.g. isolation_level).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, timeout=timeout, check_same_thread=False, **kwargs)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
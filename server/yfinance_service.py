@@ -3,12 +3,31 @@ YFinance Service Integration
 Enhanced financial data integration using the yfinance Python package for real-time market data and news
 """
 
+import atexit
+import bisect
+import hashlib
+import heapq
 import json
 import logging
+import math
+import os
+import queue
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import re
 
+from concurrency_utils import TokenBucket, iter_concurrent
+from market_indicators import IndicatorEngine, latest_values
+from price_cache import PRICE_FIELDS, PriceHistoryCache
+from sentiment_correlation import DEFAULT_HORIZONS, correlate_sentiment
+from sqlite_utils import open_sqlite
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,28 +38,479 @@ try:
     import pandas as pd
     IMPORT_ERROR = None
 except ImportError as e:
-    print(f"Warning: yfinance not available: {e}")
+    logger.warning(f"yfinance not available: {e}")
     yf = None
     pd = None
     IMPORT_ERROR = str(e)
 
+# Major market indicators polled for general market news
+MARKET_NEWS_TICKERS = ["SPY", "QQQ", "IWM", "^VIX"]
+
+# Keyword lexicon for headline sentiment
+POSITIVE_WORDS = ('gain', 'gains', 'up', 'rise', 'rises', 'bull', 'bullish', 'growth', 'profit', 'profits',
+                  'increase', 'strong', 'buy', 'upgrade', 'outperform', 'beat', 'beats', 'positive', 'good')
+NEGATIVE_WORDS = ('fall', 'falls', 'down', 'drop', 'drops', 'bear', 'bearish', 'loss', 'losses',
+                  'decrease', 'weak', 'sell', 'downgrade', 'underperform', 'miss', 'misses', 'negative', 'bad')
+
+# One precompiled alternation with word boundaries: a single scan per headline,
+# and "up" no longer matches "update" (nor "bad" -> "Baden", "good" -> "goodwill")
+SENTIMENT_PATTERN = re.compile(
+    r"\b(?:" + "|".join(sorted(map(re.escape, POSITIVE_WORDS + NEGATIVE_WORDS), key=len, reverse=True)) + r")\b"
+)
+SENTIMENT_POLARITY = {**{word: 1 for word in POSITIVE_WORDS}, **{word: -1 for word in NEGATIVE_WORDS}}
+# Stored scores are only reused while the keyword lexicon is unchanged
+SENTIMENT_VERSION = hashlib.sha1("|".join(POSITIVE_WORDS + NEGATIVE_WORDS).encode("utf-8")).hexdigest()[:12]
+
+# Query parameters that vary per referral but not per story
+TRACKING_PARAMS = {"guccounter", "guce_referrer", "guce_referrer_sig", "ncid", "yptr", "soc_src", "soc_trk", ".tsrc", "sr_share"}
+
+def canonicalize_url(url: str) -> str:
+    """Normalize an article URL so the same story always maps to the same string"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), path, urlencode(query), ""))
+
+class Article:
+    """Normalized news article; the id is derived from the canonical URL and is stable across processes"""
+    
+    __slots__ = ("id", "headline", "url", "canonical_url", "source", "pub_date", "published_at",
+                 "symbol", "sentiment_score", "is_new")
+    
+    def __init__(self, headline: str, url: str, source: str, pub_date: Any, symbol: str,
+                 published_at: Optional[float] = None):
+        self.headline = headline
+        self.url = url
+        self.canonical_url = canonicalize_url(url)
+        self.id = "yf_" + hashlib.sha1(self.canonical_url.encode("utf-8")).hexdigest()[:16]
+        self.source = source
+        self.pub_date = pub_date
+        self.published_at = published_at
+        self.symbol = symbol
+        self.sentiment_score = 0.0
+        self.is_new = True
+
+def article_sort_key(article: Article) -> tuple:
+    """Newest-first ordering key; the id breaks ties between same-second articles"""
+    return (article.published_at or 0.0, article.id)
+
+def parse_cursor(cursor: Any) -> Optional[tuple]:
+    """
+    A news cursor is "<epoch>:<article id>" as returned by the news methods,
+    or a bare epoch (seconds) meaning "published after this time"
+    """
+    if cursor is None or cursor == "":
+        return None
+    text = str(cursor)
+    epoch, _, article_id = text.partition(":")
+    try:
+        return (float(epoch), article_id or None)
+    except ValueError:
+        raise ValueError(f"Invalid news cursor: {text}")
+
+def is_after_cursor(article: Article, cursor: Optional[tuple]) -> bool:
+    if cursor is None:
+        return True
+    if article.published_at is None:
+        # Undated articles cannot be placed relative to a cursor
+        return False
+    epoch, article_id = cursor
+    if article_id is None:
+        return article.published_at > epoch
+    return article_sort_key(article) > (epoch, article_id)
+
+def format_cursor(articles: List[Article], cursor: Any = None) -> Optional[str]:
+    """
+    Cursor for the newest dated article, or the caller's cursor if none is
+    newer. The epoch is written exactly (shortest round-trip form), so
+    is_after_cursor compares against the same value that was stored.
+    """
+    dated = [article for article in articles if article.published_at is not None]
+    if not dated:
+        return str(cursor) if cursor not in (None, "") else None
+    newest = max(dated, key=article_sort_key)
+    epoch = float(newest.published_at)
+    return f"{int(epoch) if epoch.is_integer() else repr(epoch)}:{newest.id}"
+
+# Shared on-disk cache location for the short-lived CLI processes
+CACHE_DIR = os.environ.get("YFINANCE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# Upstream budget for background news refreshes, shared by every refresh in a process
+RATE_LIMITER = TokenBucket(float(os.environ.get("YFINANCE_REFRESH_RATE", "2")))
+
+class NewsCache:
+    """
+    SQLite (WAL mode) cache of raw ticker news keyed by symbol, shared by every
+    service process. Entries older than ttl are still served while a single
+    background refresh, guarded by a lease, fetches a replacement.
+    """
+    
+    def __init__(self, path: str, ttl: float = 300, max_stale: float = 86400, lease: float = 60):
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.lease = lease
+        self.lock = threading.Lock()
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        
+        self.db = open_sqlite(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS ticker_news ("
+            "symbol TEXT PRIMARY KEY, payload TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "refreshing_since REAL)"
+        )
+        self.db.commit()
+    
+    def get(self, symbol: str) -> Optional[tuple]:
+        """Return (news, age_seconds) for a cached symbol, or None"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload, fetched_at FROM ticker_news WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+    
+    def put(self, symbol: str, news: List[Dict[str, Any]]):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO ticker_news (symbol, payload, fetched_at, refreshing_since) "
+                "VALUES (?, ?, ?, NULL)",
+                (symbol, json.dumps(news, default=str), time.time())
+            )
+            self.db.commit()
+    
+    def claim_refresh(self, symbol: str) -> bool:
+        """Take the refresh lease for a symbol; False if another refresh holds it"""
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE ticker_news SET refreshing_since = ? WHERE symbol = ? "
+                "AND (refreshing_since IS NULL OR refreshing_since < ?)",
+                (now, symbol, now - self.lease)
+            )
+            self.db.commit()
+        return cursor.rowcount == 1
+    
+    def release_refresh(self, symbol: str):
+        with self.lock:
+            self.db.execute("UPDATE ticker_news SET refreshing_since = NULL WHERE symbol = ?", (symbol,))
+            self.db.commit()
+    
+    def count(self, name: str):
+        """Increment a stats counter; the cache is shared by the refresh threads"""
+        with self.lock:
+            self.stats[name] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+        return {**stats, "path": self.path, "ttl": self.ttl, "max_stale": self.max_stale}
+
+class ArticleIndex:
+    """
+    Persistent dedup index of every article seen by any ticker or call,
+    storing the symbol it was first seen under and its sentiment score so a
+    story is analyzed once no matter how many tickers mention it. Every
+    symbol a story was seen under is kept in article_symbols. Rows older than
+    the retention window are dropped on open and every PRUNE_INTERVAL inserts.
+    """
+    
+    PRUNE_INTERVAL = 1000
+    
+    def __init__(self, path: str, retention_days: float = 30):
+        self.path = path
+        self.retention = retention_days * 86400
+        self.inserts_since_prune = 0
+        self.lock = threading.Lock()
+        self.db = open_sqlite(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "article_id TEXT PRIMARY KEY, canonical_url TEXT NOT NULL, symbol TEXT, "
+            "first_seen REAL NOT NULL, sentiment_score REAL, sentiment_version TEXT, published_at REAL)"
+        )
+        # Indexes created before publication times were stored
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(articles)")}
+        if "published_at" not in columns:
+            self.db.execute("ALTER TABLE articles ADD COLUMN published_at REAL")
+        tables = {row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS article_symbols ("
+            "article_id TEXT NOT NULL, symbol TEXT NOT NULL, first_seen REAL NOT NULL, "
+            "PRIMARY KEY (article_id, symbol))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS article_symbols_symbol ON article_symbols (symbol)")
+        if "article_symbols" not in tables:
+            # Indexes created before the mapping table only know the first symbol
+            self.db.execute(
+                "INSERT OR IGNORE INTO article_symbols SELECT article_id, symbol, first_seen "
+                "FROM articles WHERE symbol IS NOT NULL"
+            )
+        self._prune()
+        self.db.commit()
+    
+    def _prune(self):
+        """Delete rows older than the retention window (caller commits)"""
+        cutoff = time.time() - self.retention
+        self.db.execute("DELETE FROM articles WHERE first_seen < ?", (cutoff,))
+        self.db.execute("DELETE FROM article_symbols WHERE first_seen < ?", (cutoff,))
+        self.inserts_since_prune = 0
+    
+    def lookup(self, article_ids: List[str]) -> Dict[str, tuple]:
+        """Return {article_id: (sentiment_score, sentiment_version)} for ids already indexed"""
+        if not article_ids:
+            return {}
+        placeholders = ",".join("?" * len(article_ids))
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT article_id, sentiment_score, sentiment_version FROM articles WHERE article_id IN ({placeholders})",
+                article_ids
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+    
+    def add(self, articles: List[Article]) -> Tuple[set, set]:
+        """
+        Insert articles and their symbol mappings in one transaction. Returns
+        the article ids whose row this call created and the (article_id,
+        symbol) pairs it mapped first; INSERT OR IGNORE decides per row, so
+        concurrent callers never both see the same article as new.
+        """
+        now = time.time()
+        created = set()
+        mapped = set()
+        with self.lock:
+            try:
+                for a in articles:
+                    cursor = self.db.execute(
+                        "INSERT OR IGNORE INTO articles (article_id, canonical_url, symbol, first_seen, sentiment_score, sentiment_version, published_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (a.id, a.canonical_url, a.symbol, now, a.sentiment_score, SENTIMENT_VERSION,
+                         float(a.published_at) if a.published_at is not None else None)
+                    )
+                    if cursor.rowcount == 1:
+                        created.add(a.id)
+                    cursor = self.db.execute(
+                        "INSERT OR IGNORE INTO article_symbols (article_id, symbol, first_seen) VALUES (?, ?, ?)",
+                        (a.id, a.symbol, now)
+                    )
+                    if cursor.rowcount == 1:
+                        mapped.add((a.id, a.symbol))
+                self.inserts_since_prune += len(articles)
+                if self.inserts_since_prune >= self.PRUNE_INTERVAL:
+                    self._prune()
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+        return created, mapped
+    
+    def observations(self, symbols: List[str], since: Optional[float] = None) -> List[tuple]:
+        """(symbol, timestamp, sentiment_score) per article; published time, else first seen"""
+        if not symbols:
+            return []
+        placeholders = ",".join("?" * len(symbols))
+        query = (f"SELECT m.symbol, COALESCE(a.published_at, a.first_seen), a.sentiment_score "
+                 f"FROM article_symbols m JOIN articles a ON a.article_id = m.article_id "
+                 f"WHERE m.symbol IN ({placeholders}) AND a.sentiment_score IS NOT NULL")
+        args = list(symbols)
+        if since is not None:
+            query += " AND COALESCE(a.published_at, a.first_seen) >= ?"
+            args.append(since)
+        with self.lock:
+            return self.db.execute(query, args).fetchall()
+
+MARKET_INDEX_KEY = "__MARKET__"
+
+class SentimentIndex:
+    """
+    Persistent, incrementally maintained sentiment index per symbol plus a
+    market-wide entry. Each key keeps exponentially decayed sums of score and
+    weight referenced to one timestamp, so adding an article is O(1) and the
+    decayed mean can be read at any time without touching the network.
+    Articles are also rolled into fixed-size time buckets for trend views;
+    buckets older than the retention window are dropped every PRUNE_INTERVAL
+    observations.
+    """
+    
+    PRUNE_INTERVAL = 1000
+    
+    def __init__(self, path: str, half_life: float = 21600, bucket_size: float = 3600,
+                 retention_days: float = 30):
+        self.path = path
+        self.half_life = half_life
+        self.bucket_size = bucket_size
+        self.retention = retention_days * 86400
+        self.observations_since_prune = 0
+        self.lock = threading.Lock()
+        # Autocommit mode; update_many() opens its own IMMEDIATE transaction
+        self.db = open_sqlite(path, isolation_level=None)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_index ("
+            "symbol TEXT PRIMARY KEY, value_sum REAL NOT NULL, weight_sum REAL NOT NULL, "
+            "ref_time REAL NOT NULL, article_count INTEGER NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_buckets ("
+            "symbol TEXT NOT NULL, bucket_start REAL NOT NULL, score_sum REAL NOT NULL, "
+            "article_count INTEGER NOT NULL, PRIMARY KEY (symbol, bucket_start))"
+        )
+        self._prune()
+    
+    def _prune(self):
+        """Delete buckets older than the retention window"""
+        self.db.execute("DELETE FROM sentiment_buckets WHERE bucket_start < ?", (time.time() - self.retention,))
+        self.observations_since_prune = 0
+    
+    def _decay(self, seconds: float) -> float:
+        return math.pow(0.5, seconds / self.half_life)
+    
+    def update_many(self, observations: List[tuple]):
+        """Fold (symbol, timestamp, score) observations into the index and the buckets"""
+        if not observations:
+            return
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for symbol, timestamp, score in observations:
+                    row = self.db.execute(
+                        "SELECT value_sum, weight_sum, ref_time, article_count FROM sentiment_index WHERE symbol = ?",
+                        (symbol,)
+                    ).fetchone()
+                    value_sum, weight_sum, ref_time, count = row if row else (0.0, 0.0, timestamp, 0)
+                    if timestamp >= ref_time:
+                        # Move the reference forward, decaying the existing sums
+                        factor = self._decay(timestamp - ref_time)
+                        value_sum, weight_sum, ref_time = value_sum * factor + score, weight_sum * factor + 1.0, timestamp
+                    else:
+                        # Late article: discount it to the current reference time
+                        factor = self._decay(ref_time - timestamp)
+                        value_sum, weight_sum = value_sum + score * factor, weight_sum + factor
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO sentiment_index VALUES (?, ?, ?, ?, ?)",
+                        (symbol, value_sum, weight_sum, ref_time, count + 1)
+                    )
+                    
+                    bucket_start = timestamp - timestamp % self.bucket_size
+                    self.db.execute(
+                        "INSERT INTO sentiment_buckets VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT(symbol, bucket_start) DO UPDATE SET "
+                        "score_sum = score_sum + excluded.score_sum, article_count = article_count + 1",
+                        (symbol, bucket_start, score)
+                    )
+                self.observations_since_prune += len(observations)
+                if self.observations_since_prune >= self.PRUNE_INTERVAL:
+                    self._prune()
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+    
+    def query(self, symbol: str, buckets: int = 24, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Current decayed sentiment for a key plus its most recent buckets"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value_sum, weight_sum, ref_time, article_count FROM sentiment_index WHERE symbol = ?",
+                (symbol,)
+            ).fetchone()
+            bucket_rows = self.db.execute(
+                "SELECT bucket_start, score_sum, article_count FROM sentiment_buckets "
+                "WHERE symbol = ? ORDER BY bucket_start DESC LIMIT ?",
+                (symbol, buckets)
+            ).fetchall()
+        if not row:
+            return None
+        
+        value_sum, weight_sum, ref_time, count = row
+        # Decaying both sums by the same factor leaves the mean unchanged;
+        # the decayed weight says how much recent evidence backs it
+        mean = value_sum / weight_sum if weight_sum else 0.0
+        return {
+            "raw_sentiment": mean,
+            "effective_weight": weight_sum * self._decay(max(0.0, now - ref_time)),
+            "article_count": count,
+            "updated_at": ref_time,
+            "buckets": [
+                {"start": start, "average": score_sum / n, "article_count": n}
+                for start, score_sum, n in reversed(bucket_rows)
+            ]
+        }
+
 class YFinanceService:
     """Service for fetching financial data using yfinance package"""
     
     def __init__(self):
         self.available = yf is not None and pd is not None
         self.import_error = IMPORT_ERROR
+        # Per-call deadline for ticker fan-out, kept below the Node route's 30s kill
+        self.fanout_timeout = float(os.environ.get("YFINANCE_FANOUT_TIMEOUT", "20"))
+        
+        # Stale entries are refreshed by one detached process per CLI call
+        # ("process") or by a single daemon worker in a long-lived process
+        # ("thread"); either way upstream calls go through RATE_LIMITER
+        self.refresh_mode = "process"
+        self.refresh_lock = threading.Lock()
+        self.pending_refreshes = []
+        self.refresh_queue = None
+        self.news_cache = None
+        if self.available and os.environ.get("YFINANCE_NEWS_CACHE", "1") != "0":
+            try:
+                self.news_cache = NewsCache(
+                    os.path.join(CACHE_DIR, "yfinance_news.sqlite"),
+                    ttl=float(os.environ.get("YFINANCE_NEWS_TTL", "300")),
+                    max_stale=float(os.environ.get("YFINANCE_NEWS_MAX_STALE", "86400"))
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"News cache disabled: {e}")
+        
+        # Created on first use (needs NumPy); indicator states and their latest
+        # values are kept per (interval, symbols) so a long-lived process only
+        # folds in new bars
+        self.price_cache = None
+        self.indicator_states = {}
+        
+        self.article_index = None
+        if self.available and os.environ.get("YFINANCE_ARTICLE_INDEX", "1") != "0":
+            try:
+                self.article_index = ArticleIndex(
+                    os.path.join(CACHE_DIR, "yfinance_articles.sqlite"),
+                    retention_days=float(os.environ.get("YFINANCE_ARTICLE_RETENTION_DAYS", "30"))
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Article index disabled: {e}")
+        
+        # The index is fed with articles the article index reports as new, so
+        # it needs the article index to avoid counting a story twice
+        self.sentiment_index = None
+        if self.article_index is not None and os.environ.get("YFINANCE_SENTIMENT_INDEX", "1") != "0":
+            try:
+                self.sentiment_index = SentimentIndex(
+                    os.path.join(CACHE_DIR, "yfinance_sentiment.sqlite"),
+                    half_life=float(os.environ.get("YFINANCE_SENTIMENT_HALF_LIFE", "21600")),
+                    bucket_size=float(os.environ.get("YFINANCE_SENTIMENT_BUCKET", "3600")),
+                    retention_days=float(os.environ.get("YFINANCE_ARTICLE_RETENTION_DAYS", "30"))
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Sentiment index disabled: {e}")
         if self.available:
-            print("✓ YFinance service initialized successfully")
+            logger.info("✓ YFinance service initialized successfully")
         else:
-            print(f"Warning: YFinance service not available. Import error: {IMPORT_ERROR}")
+            logger.warning(f"YFinance service not available. Import error: {IMPORT_ERROR}")
     
     def is_available(self) -> bool:
         """Check if YFinance service is available"""
         return self.available
     
-    def get_stock_news(self, symbol: str = "SPY") -> Dict[str, Any]:
-        """Get latest news for a stock symbol"""
+    def get_stock_news(self, symbol: str = "SPY", limiter: Optional[TokenBucket] = None,
+                       new_only: bool = False, since: Any = None) -> Dict[str, Any]:
+        """
+        Get latest news for a stock symbol, newest first (new_only: skip articles
+        already indexed by earlier calls; since: only articles newer than a
+        cursor from a previous response)
+        """
         if not self.is_available():
             return {
                 "error": "YFinance service not available",
@@ -51,58 +521,35 @@ class YFinanceService:
             }
         
         try:
-            ticker = yf.Ticker(symbol)
-            news = ticker.news
+            cursor = parse_cursor(since)
+            news = self._fetch_ticker_news(symbol, limiter)
             
             # Process and standardize the data
-            processed_articles = []
-            for idx, article in enumerate(news[:15]):  # Get top 15 news articles
-                if isinstance(article, dict) and article:
-                    # YFinance now nests data under 'content' key
-                    content = article.get('content', article)
-                    if not content or not isinstance(content, dict):
-                        continue
-                        
-                    title = content.get('title', '')
-                    
-                    # Handle clickThroughUrl safely (can be None)
-                    clickthrough = content.get('clickThroughUrl', {})
-                    url1 = clickthrough.get('url', '') if clickthrough else ''
-                    
-                    # Handle canonicalUrl safely (can be None)
-                    canonical = content.get('canonicalUrl', {})
-                    url2 = canonical.get('url', '') if canonical else ''
-                    
-                    url = url1 or url2
-                    
-                    # Handle provider safely (can be None)
-                    provider_data = content.get('provider', {})
-                    provider = provider_data.get('displayName', 'YFinance') if provider_data else 'YFinance'
-                    
-                    pub_date = content.get('pubDate', '') or content.get('displayTime', '')
-                    
-                    if title and url:  # Only include articles with valid title and URL
-                        processed_articles.append({
-                            "id": f"yf_{symbol}_{idx}_{hash(url) % 1000000}",
-                            "headline": title,
-                            "url": url,
-                            "time": self._format_timestamp(pub_date),
-                            "source": provider,
-                            "sentiment_score": self._calculate_basic_sentiment(title)
-                        })
+            articles = self._index_articles(self._parse_articles(news[:15], symbol))  # Top 15 news articles
+            articles.sort(key=article_sort_key, reverse=True)
+            if new_only:
+                articles = [article for article in articles if article.is_new]
+            articles = [article for article in articles if is_after_cursor(article, cursor)]
+            processed_articles = [self._article_to_dict(article) for article in articles]
             
             return {
                 "status": "success",
                 "source": f"YFinance News for {symbol}",
                 "total": len(processed_articles),
-                "articles": processed_articles
+                "articles": processed_articles,
+                "cursor": format_cursor(articles, since)
             }
             
         except Exception as e:
             return {"error": f"Failed to fetch news for {symbol}: {str(e)}", "articles": []}
     
-    def get_market_news(self) -> Dict[str, Any]:
-        """Get general market news from multiple major tickers"""
+    def get_market_news(self, timeout: Optional[float] = None, since: Any = None) -> Dict[str, Any]:
+        """
+        Get general market news from multiple major tickers. The tickers are
+        fetched concurrently; whatever finishes within the deadline is returned
+        newest first together with a per-ticker status block. With a since
+        cursor only articles newer than it are returned.
+        """
         if not self.is_available():
             return {
                 "error": "YFinance service not available",
@@ -112,74 +559,306 @@ class YFinanceService:
                 "articles": []
             }
         
+        if timeout is None:
+            timeout = self.fanout_timeout
+        
         try:
+            cursor = parse_cursor(since)
             # Get news from major market indicators
-            tickers = ["SPY", "QQQ", "IWM", "^VIX"]
+            tickers = MARKET_NEWS_TICKERS
+            news_by_symbol = {}
+            ticker_status = {}
+            
+            for symbol, outcome in iter_concurrent(self._fetch_ticker_news, tickers,
+                                                   max_workers=len(tickers), timeout=timeout):
+                ticker_status[symbol] = {
+                    "status": outcome["status"],
+                    "latency_ms": outcome["latency_ms"]
+                }
+                if outcome["status"] == "ok":
+                    news_by_symbol[symbol] = outcome["value"] or []
+                elif outcome["status"] == "error":
+                    ticker_status[symbol]["error"] = outcome["error"]
+            
+            # Assemble in ticker order so the output does not depend on timing
             all_articles = []
+            for symbol in tickers:
+                all_articles.extend(self._parse_articles(news_by_symbol.get(symbol, [])[:5], symbol))  # Top 5 from each
             
-            for ticker_idx, symbol in enumerate(tickers):
-                try:
-                    ticker = yf.Ticker(symbol)
-                    news = ticker.news
-                    
-                    for article_idx, article in enumerate(news[:5]):  # Top 5 from each
-                        if isinstance(article, dict) and article:
-                            # YFinance now nests data under 'content' key
-                            content = article.get('content', article)
-                            if not content or not isinstance(content, dict):
-                                continue
-                                
-                            title = content.get('title', '')
-                            
-                            # Handle clickThroughUrl safely (can be None)
-                            clickthrough = content.get('clickThroughUrl', {})
-                            url1 = clickthrough.get('url', '') if clickthrough else ''
-                            
-                            # Handle canonicalUrl safely (can be None)
-                            canonical = content.get('canonicalUrl', {})
-                            url2 = canonical.get('url', '') if canonical else ''
-                            
-                            url = url1 or url2
-                            
-                            # Handle provider safely (can be None)
-                            provider_data = content.get('provider', {})
-                            provider = provider_data.get('displayName', 'YFinance') if provider_data else 'YFinance'
-                            
-                            pub_date = content.get('pubDate', '') or content.get('displayTime', '')
-                            
-                            if title and url:  # Only include articles with valid title and URL
-                                all_articles.append({
-                                    "id": f"yf_market_{ticker_idx}_{article_idx}_{hash(url) % 1000000}",
-                                    "headline": title,
-                                    "url": url,
-                                    "time": self._format_timestamp(pub_date),
-                                    "source": provider,
-                                    "sentiment_score": self._calculate_basic_sentiment(title),
-                                    "symbol": symbol
-                                })
-                except:
-                    continue
+            # Cross-ticker duplicates collapse onto the same stable id
+            unique_articles = self._index_articles(all_articles)
+            
+            # k-way merge of the per-ticker newest-first lists; the stream is
+            # ordered, so it stops at the cursor or after the top 20
+            per_ticker = {}
+            for article in unique_articles:
+                per_ticker.setdefault(article.symbol, []).append(article)
+            for articles in per_ticker.values():
+                articles.sort(key=article_sort_key, reverse=True)
+            merged = heapq.merge(*per_ticker.values(), key=article_sort_key, reverse=True)
             
-            # Remove duplicates based on URL
-            seen_urls = set()
-            unique_articles = []
-            for article in all_articles:
-                if article['url'] not in seen_urls:
-                    seen_urls.add(article['url'])
-                    unique_articles.append(article)
+            latest = []
+            for article in merged:
+                if len(latest) == 20 or (cursor is not None and not is_after_cursor(article, cursor)):
+                    break
+                latest.append(article)
             
             return {
                 "status": "success",
                 "source": "YFinance Market News",
-                "total": len(unique_articles),
-                "articles": unique_articles[:20]  # Return top 20
+                "total": len(latest),
+                "articles": [self._article_to_dict(article, include_symbol=True) for article in latest],  # Return top 20
+                "cursor": format_cursor(latest, since),
+                "tickers": {symbol: ticker_status[symbol] for symbol in tickers}
             }
             
         except Exception as e:
             return {"error": f"Failed to fetch market news: {str(e)}", "articles": []}
     
+    def scan_watchlist(self, symbols: Iterable[str], max_workers: int = 8,
+                       rate_per_sec: float = 5.0, new_only: bool = False,
+                       since: Any = None) -> Iterator[Dict[str, Any]]:
+        """
+        Fetch news for many symbols with bounded concurrency and a shared
+        upstream rate limit, yielding one record per symbol as it completes.
+        Symbols are consumed lazily, so long watchlists use constant memory.
+        With new_only, each story is shipped once across all symbols and scans.
+        """
+        limiter = TokenBucket(rate_per_sec)
+        
+        def scan(symbol: str) -> Dict[str, Any]:
+            return self.get_stock_news(symbol, limiter=limiter, new_only=new_only, since=since)
+        
+        for symbol, outcome in iter_concurrent(scan, symbols, max_workers=max_workers):
+            record = {"symbol": symbol, "latency_ms": outcome["latency_ms"]}
+            result = outcome.get("value") or {}
+            if outcome["status"] != "ok" or result.get("error"):
+                record["status"] = "error"
+                record["error"] = result.get("error") or outcome.get("error", "unknown error")
+                record["articles"] = []
+                # Nothing was consumed: resuming from the caller's cursor retries this symbol
+                record["cursor"] = format_cursor([], since)
+            else:
+                record["status"] = "ok"
+                record["articles"] = result.get("articles", [])
+                record["cursor"] = result.get("cursor")
+            record["sentiment"] = self._aggregate_sentiment(record["articles"])
+            yield record
+    
+    def _aggregate_sentiment(self, articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize per-article basic sentiment scores"""
+        scores = [article["sentiment_score"] for article in articles]
+        return {
+            "average": sum(scores) / len(scores) if scores else 0.0,
+            "count": len(scores),
+            "positive": sum(1 for score in scores if score > 0),
+            "negative": sum(1 for score in scores if score < 0)
+        }
+    
+    def _fetch_ticker_news(self, symbol: str, limiter: Optional[TokenBucket] = None) -> List[Dict[str, Any]]:
+        """
+        Raw news list for a ticker, served from the shared cache when possible.
+        Expired entries are returned immediately and refreshed in the background.
+        """
+        cache = self.news_cache
+        if cache is None:
+            return self._fetch_ticker_news_upstream(symbol, limiter)
+        
+        entry = cache.get(symbol)
+        if entry is not None:
+            news, age = entry
+            if age <= cache.ttl:
+                cache.count("fresh_hits")
+                return news
+            if age <= cache.max_stale:
+                cache.count("stale_hits")
+                if cache.claim_refresh(symbol):
+                    self._schedule_refresh(symbol)
+                return news
+        
+        cache.count("misses")
+        news = self._fetch_ticker_news_upstream(symbol, limiter)
+        cache.put(symbol, news)
+        return news
+    
+    def _fetch_ticker_news_upstream(self, symbol: str, limiter: Optional[TokenBucket] = None) -> List[Dict[str, Any]]:
+        """Fetch the raw news list for a ticker from Yahoo Finance"""
+        if limiter is not None:
+            limiter.acquire()
+        return yf.Ticker(symbol).news or []
+    
+    def refresh_ticker_news(self, symbol: str) -> Dict[str, Any]:
+        """Re-fetch a symbol's news into the cache (background refresh entry point)"""
+        try:
+            news = self._fetch_ticker_news_upstream(symbol, RATE_LIMITER)
+            if self.news_cache is not None:
+                self.news_cache.put(symbol, news)
+                self.news_cache.count("refreshes")
+            # Keep the sentiment index current for readers that never fetch
+            self._index_articles(self._parse_articles(news, symbol))
+            return {"status": "success", "symbol": symbol, "total": len(news)}
+        except Exception as e:
+            if self.news_cache is not None:
+                self.news_cache.release_refresh(symbol)
+            return {"error": f"Failed to refresh news for {symbol}: {str(e)}"}
+    
+    def refresh_ticker_news_many(self, symbols: List[str]) -> Dict[str, Any]:
+        """Refresh several symbols one after another under the shared rate limit"""
+        results = [self.refresh_ticker_news(symbol) for symbol in symbols]
+        return {
+            "status": "success",
+            "refreshed": [result["symbol"] for result in results if not result.get("error")],
+            "errors": [result["error"] for result in results if result.get("error")]
+        }
+    
+    def _schedule_refresh(self, symbol: str):
+        """Refresh a stale cache entry without delaying the current response"""
+        with self.refresh_lock:
+            if self.refresh_mode == "thread":
+                if self.refresh_queue is None:
+                    self.refresh_queue = queue.Queue()
+                    threading.Thread(target=self._refresh_worker, daemon=True).start()
+                self.refresh_queue.put(symbol)
+                return
+            # Batched into one background process when this process exits
+            if not self.pending_refreshes:
+                atexit.register(self._spawn_refresh_process)
+            self.pending_refreshes.append(symbol)
+    
+    def _refresh_worker(self):
+        """Drain the in-process refresh queue one symbol at a time"""
+        while True:
+            self.refresh_ticker_news(self.refresh_queue.get())
+    
+    def _spawn_refresh_process(self):
+        """Start a single detached refresh_news process for every stale symbol of this call"""
+        with self.refresh_lock:
+            symbols, self.pending_refreshes = self.pending_refreshes, []
+        if not symbols:
+            return
+        try:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "refresh_news", ",".join(symbols)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        except OSError as e:
+            logger.warning(f"Could not start news refresh for {', '.join(symbols)}: {e}")
+            for symbol in symbols:
+                self.news_cache.release_refresh(symbol)
+    
+    def _parse_articles(self, news: List[Any], symbol: str) -> List[Article]:
+        """Turn raw yfinance news items into Article records, skipping unusable ones"""
+        articles = []
+        for raw in news:
+            item = self._normalize_news_item(raw)
+            if item:
+                title, url, provider, pub_date = item
+                articles.append(Article(title, url, provider, pub_date, symbol, self._parse_timestamp(pub_date)))
+        return articles
+    
+    def _index_articles(self, articles: List[Article]) -> List[Article]:
+        """
+        Drop in-call duplicates by stable id, reuse stored scores for articles
+        the index has already seen and score (then index) only the new ones.
+        An article is new only if this call's insert created its index row.
+        Every symbol a duplicate was carried under is still mapped.
+        """
+        unique = []
+        by_id = {}
+        for article in articles:
+            if article.id not in by_id:
+                by_id[article.id] = article
+                unique.append(article)
+        
+        known = self.article_index.lookup(list(by_id)) if self.article_index else {}
+        fresh = []
+        for article in unique:
+            stored = known.get(article.id)
+            if stored is not None and stored[1] == SENTIMENT_VERSION:
+                article.sentiment_score = stored[0]
+            else:
+                fresh.append(article)
+        
+        # Score all headlines that need it in one pass
+        scores = self.calculate_basic_sentiment_batch([a.headline for a in fresh])
+        for article, score in zip(fresh, scores):
+            article.sentiment_score = score
+        if self.article_index:
+            for article in articles:
+                article.sentiment_score = by_id[article.id].sentiment_score
+            created, mapped = self.article_index.add(articles)
+            for article in unique:
+                article.is_new = article.id in created
+            # Only rows this call's insert created reach the sentiment index:
+            # a story counts once per symbol and once for the market
+            if self.sentiment_index and mapped:
+                now = time.time()
+                observations = []
+                for article in articles:
+                    pair = (article.id, article.symbol)
+                    if pair in mapped:
+                        mapped.discard(pair)
+                        observations.append((article.symbol, article.published_at or now, article.sentiment_score))
+                for article in unique:
+                    if article.is_new:
+                        observations.append((MARKET_INDEX_KEY, article.published_at or now, article.sentiment_score))
+                self.sentiment_index.update_many(observations)
+        return unique
+    
+    def _article_to_dict(self, article: Article, include_symbol: bool = False) -> Dict[str, Any]:
+        """Response shape for an article"""
+        result = {
+            "id": article.id,
+            "headline": article.headline,
+            "url": article.url,
+            "time": self._format_timestamp(article.pub_date),
+            "published_at": int(article.published_at) if article.published_at is not None else None,
+            "source": article.source,
+            "sentiment_score": article.sentiment_score
+        }
+        if include_symbol:
+            result["symbol"] = article.symbol
+        return result
+    
+    def _normalize_news_item(self, article: Any) -> Optional[tuple]:
+        """Extract (title, url, provider, pub_date) from a raw news item, or None if unusable"""
+        if not isinstance(article, dict) or not article:
+            return None
+        
+        # YFinance now nests data under 'content' key
+        content = article.get('content', article)
+        if not content or not isinstance(content, dict):
+            return None
+        
+        title = content.get('title', '')
+        
+        # Handle clickThroughUrl safely (can be None)
+        clickthrough = content.get('clickThroughUrl', {})
+        url1 = clickthrough.get('url', '') if clickthrough else ''
+        
+        # Handle canonicalUrl safely (can be None)
+        canonical = content.get('canonicalUrl', {})
+        url2 = canonical.get('url', '') if canonical else ''
+        
+        url = url1 or url2
+        
+        # Handle provider safely (can be None)
+        provider_data = content.get('provider', {})
+        provider = provider_data.get('displayName', 'YFinance') if provider_data else 'YFinance'
+        
+        pub_date = content.get('pubDate', '') or content.get('displayTime', '')
+        
+        # Only include articles with valid title and URL
+        if not (title and url):
+            return None
+        return title, url, provider, pub_date
+    
     def get_enhanced_sentiment_data(self) -> Dict[str, Any]:
-        """Get enhanced sentiment analysis based on market news"""
+        """
+        Market sentiment served from the persistent sentiment index; market
+        news is only fetched (and indexed) when the index has no entry yet
+        """
         if not self.is_available():
             return {
                 "error": "YFinance service not available",
@@ -189,36 +868,326 @@ class YFinanceService:
             }
         
         try:
-            # Get market news for sentiment analysis
-            market_news = self.get_market_news()
-            
-            if market_news.get("error"):
-                return market_news
-            
-            articles = market_news.get("articles", [])
-            if not articles:
-                return {"error": "No articles available for sentiment analysis"}
-            
-            # Calculate sentiment metrics
-            sentiment_scores = [article["sentiment_score"] for article in articles]
-            avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
+            market_index = self.get_sentiment_index()
+            if market_index.get("status") == "success":
+                articles = self._cached_market_articles()
+            else:
+                # Get market news for sentiment analysis; this feeds the index
+                market_news = self.get_market_news()
+                
+                if market_news.get("error"):
+                    return market_news
+                
+                articles = market_news.get("articles", [])
+                if not articles:
+                    return {"error": "No articles available for sentiment analysis"}
+                market_index = self.get_sentiment_index()
             
-            # Normalize to 0-100 scale (YFinance sentiment is typically -1 to 1)
-            normalized_score = int((avg_sentiment + 1) * 50)  # Convert -1,1 to 0,100
+            if market_index.get("status") == "success":
+                avg_sentiment = market_index["raw_sentiment"]
+                article_count = market_index["article_count"]
+            else:
+                # Index disabled: average this call's headlines
+                sentiment_scores = [article["sentiment_score"] for article in articles]
+                avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
+                article_count = len(articles)
             
-            return {
+            result = {
                 "status": "success",
                 "source": "YFinance Enhanced via Market News",
-                "sentiment_score": normalized_score,
-                "article_count": len(articles),
+                # Normalize to 0-100 scale (YFinance sentiment is typically -1 to 1)
+                "sentiment_score": int((avg_sentiment + 1) * 50),
+                "article_count": article_count,
                 "raw_sentiment": avg_sentiment,
                 "latest_articles": articles[:5],
                 "trending_articles": sorted(articles, key=lambda x: x.get('sentiment_score', 0), reverse=True)[:5]
             }
             
+            if market_index.get("status") == "success":
+                result["sentiment_index"] = market_index
+            return result
+            
         except Exception as e:
             return {"error": f"Failed to calculate sentiment: {str(e)}"}
     
+    def _cached_market_articles(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Newest market-ticker articles from the news cache with their indexed
+        scores. Nothing is fetched or scored; stale tickers are refreshed in
+        the background, which also feeds the sentiment index.
+        """
+        cache = self.news_cache
+        if cache is None or self.article_index is None:
+            return []
+        
+        articles = {}
+        for symbol in MARKET_NEWS_TICKERS:
+            entry = cache.get(symbol)
+            if entry is None:
+                continue
+            news, age = entry
+            if age > cache.ttl and cache.claim_refresh(symbol):
+                self._schedule_refresh(symbol)
+            for article in self._parse_articles(news[:5], symbol):
+                articles.setdefault(article.id, article)
+        
+        known = self.article_index.lookup(list(articles))
+        scored = []
+        for article in articles.values():
+            stored = known.get(article.id)
+            if stored is not None and stored[0] is not None:
+                article.sentiment_score = stored[0]
+                scored.append(article)
+        scored.sort(key=article_sort_key, reverse=True)
+        return [self._article_to_dict(article, include_symbol=True) for article in scored[:limit]]
+    
+    def get_price_history(self, symbols: List[str], period: str = "1y", interval: str = "1d",
+                          refresh: bool = True) -> Dict[str, Any]:
+        """
+        Bring the columnar price cache up to date for many symbols and report
+        what is cached. Uncached symbols are downloaded for the whole period
+        and cached ones only from their last bar, each group in a single
+        yf.download call. Prices are split/dividend adjusted, so a corporate
+        action in the new bars re-downloads the symbol's whole period. With
+        refresh=False only the cached bars are reported (no network).
+        """
+        if not self.is_available():
+            return {
+                "error": "YFinance service not available",
+                "setup_required": True,
+                "import_error": self.import_error,
+                "instructions": "YFinance Python package needs to be installed. Run: pip install yfinance pandas"
+            }
+        
+        try:
+            cache = self._price_cache()
+            symbols = [symbol.upper() for symbol in symbols]
+            added = {symbol: 0 for symbol in symbols}
+            errors = {}
+            reloaded = set()
+            
+            if refresh:
+                last_bars = {symbol: cache.last_timestamp(symbol, interval) for symbol in symbols}
+                uncached = [symbol for symbol, last in last_bars.items() if last is None]
+                cached = [symbol for symbol, last in last_bars.items() if last is not None]
+                
+                if uncached:
+                    frame = self._download_bars(uncached, interval, period=period)
+                    self._store_bars(cache, frame, uncached, interval, added, errors)
+                if cached:
+                    start = time.strftime("%Y-%m-%d", time.gmtime(min(last_bars[symbol] for symbol in cached)))
+                    frame = self._download_bars(cached, interval, start=start)
+                    reloaded = self._store_bars(cache, frame, cached, interval, added, errors, last_bars)
+                
+                # Second step: a corporate action re-adjusted the prices before
+                # it, so those symbols are downloaded again for the whole period
+                if reloaded:
+                    group = sorted(reloaded)
+                    frame = self._download_bars(group, interval, period=period)
+                    self._store_bars(cache, frame, group, interval, added, errors)
+            
+            summary = {}
+            for symbol in symbols:
+                columns = cache.load(symbol, interval, fields=["close"])
+                if columns is None or not len(columns["timestamp"]):
+                    summary[symbol] = {"bars": 0, "new_bars": added[symbol]}
+                else:
+                    summary[symbol] = {
+                        "bars": int(len(columns["timestamp"])),
+                        "new_bars": added[symbol],
+                        "first": int(columns["timestamp"][0]),
+                        "last": int(columns["timestamp"][-1]),
+                        "last_close": float(columns["close"][-1])
+                    }
+                if symbol in reloaded:
+                    summary[symbol]["reloaded"] = True
+                if symbol in errors:
+                    summary[symbol]["error"] = errors[symbol]
+            
+            return {
+                "status": "success",
+                "source": "YFinance Price History",
+                "interval": interval,
+                "cache_dir": cache.root,
+                "symbols": summary
+            }
+            
+        except Exception as e:
+            return {"error": f"Failed to fetch price history: {str(e)}"}
+    
+    def _download_bars(self, symbols: List[str], interval: str, **window):
+        """One yf.download call for a group of symbols (window: period= or start=)"""
+        return yf.download(symbols, interval=interval, group_by="ticker", auto_adjust=True,
+                           actions=True, progress=False, threads=True, **window)
+    
+    def _store_bars(self, cache: PriceHistoryCache, frame, symbols: List[str], interval: str,
+                    added: Dict[str, int], errors: Dict[str, str],
+                    last_bars: Optional[Dict[str, int]] = None) -> set:
+        """
+        Append each symbol's bars from a downloaded frame to the cache. For an
+        incremental download (last_bars given), symbols with a corporate action
+        in the new bars are dropped from the cache and returned for a reload.
+        """
+        reloaded = set()
+        for symbol in symbols:
+            try:
+                bars = self._frame_to_bars(frame, symbol)
+                if bars is None:
+                    continue
+                if last_bars is not None and self._has_corporate_action(bars, last_bars[symbol]):
+                    cache.drop(symbol, interval)
+                    reloaded.add(symbol)
+                    continue
+                added[symbol] = cache.append(symbol, interval, bars)
+            except Exception as e:
+                errors[symbol] = str(e)
+        return reloaded
+    
+    def get_indicators(self, symbols: List[str], interval: str = "1d") -> Dict[str, Any]:
+        """
+        Latest returns, moving averages, RSI and realized volatility for cached
+        price history (see get_price_history). Repeated calls in the same
+        process only process bars added since the previous call.
+        """
+        try:
+            symbols = [symbol.upper() for symbol in symbols]
+            timestamps, found, closes = self._price_cache().load_panel(symbols, interval)
+            if not found:
+                return {"error": "No cached price history; call get_price_history first", "symbols": symbols}
+            
+            engine = IndicatorEngine()
+            panel = engine.panel(timestamps, found, closes)
+            key = (interval, tuple(found))
+            state, latest = self.indicator_states.get(key, (None, {}))
+            if state is not None and engine.can_update(state, panel):
+                indicators, state = engine.update(state, panel)
+                mode = "incremental"
+            else:
+                indicators, state = engine.compute(panel)
+                mode = "full"
+            # No new bars since the last call keeps the previous values
+            latest = latest_values(indicators) or latest
+            self.indicator_states[key] = (state, latest)
+            
+            return {
+                "status": "success",
+                "source": "YFinance Price History",
+                "interval": interval,
+                "as_of": int(timestamps[-1]),
+                "mode": mode,
+                "missing": [symbol for symbol in symbols if symbol not in found],
+                "indicators": latest
+            }
+            
+        except Exception as e:
+            return {"error": f"Failed to compute indicators: {str(e)}"}
+    
+    def get_sentiment_correlation(self, symbols: List[str], interval: str = "1d",
+                                  horizons: Iterable[int] = DEFAULT_HORIZONS, window: int = 60) -> Dict[str, Any]:
+        """
+        How indexed headline sentiment lines up with forward returns over the
+        cached price history: rank IC per horizon across the universe, pooled
+        and rolling per-symbol correlations. History is bounded by the article
+        index retention (YFINANCE_ARTICLE_RETENTION_DAYS).
+        """
+        if not self.article_index:
+            return {"error": "Article index disabled; sentiment history is not recorded"}
+        
+        try:
+            symbols = [symbol.upper() for symbol in symbols]
+            timestamps, found, closes = self._price_cache().load_panel(symbols, interval)
+            if not found:
+                return {"error": "No cached price history; call get_price_history first", "symbols": symbols}
+            
+            observations = self.article_index.observations(found, since=float(timestamps[0]))
+            report = correlate_sentiment(timestamps, found, closes, observations, horizons=horizons, window=window)
+            return {
+                "status": "success",
+                "source": "YFinance News + Price History",
+                "interval": interval,
+                "sentiment_version": SENTIMENT_VERSION,
+                "missing": [symbol for symbol in symbols if symbol not in found],
+                **report
+            }
+            
+        except Exception as e:
+            return {"error": f"Failed to correlate sentiment: {str(e)}"}
+    
+    def _price_cache(self) -> PriceHistoryCache:
+        if self.price_cache is None:
+            self.price_cache = PriceHistoryCache(os.path.join(CACHE_DIR, "prices"))
+        return self.price_cache
+    
+    def _frame_to_bars(self, frame, symbol: str) -> Optional[Dict[str, Any]]:
+        """Extract one symbol's bars from a yf.download frame as NumPy columns"""
+        if frame is None or frame.empty:
+            return None
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(0):
+                return None
+            frame = frame[symbol]
+        frame = frame.dropna(how="all")
+        if frame.empty:
+            return None
+        
+        index = frame.index
+        index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+        # Unit-independent epoch seconds (index resolution varies by pandas version)
+        bars = {"timestamp": ((index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype="int64")}
+        for field in PRICE_FIELDS:
+            bars[field] = frame[field.capitalize()].to_numpy(dtype="float64")
+        # Present when downloaded with actions=True
+        for field, column in (("dividends", "Dividends"), ("splits", "Stock Splits")):
+            if column in frame.columns:
+                bars[field] = frame[column].fillna(0).to_numpy(dtype="float64")
+        return bars
+    
+    @staticmethod
+    def _has_corporate_action(bars: Dict[str, Any], last: int) -> bool:
+        """Whether a dividend or split falls after the cached tail, re-adjusting the cached prices"""
+        recent = bars["timestamp"] > last
+        return any(field in bars and bool((bars[field][recent] != 0).any()) for field in ("dividends", "splits"))
+    
+    def get_sentiment_index(self, symbol: Optional[str] = None, buckets: int = 24) -> Dict[str, Any]:
+        """
+        Time-decayed sentiment for a symbol (or the whole market) read from the
+        persistent index; no network access
+        """
+        if self.sentiment_index is None:
+            return {"error": "Sentiment index not enabled"}
+        
+        key = symbol.upper() if symbol else MARKET_INDEX_KEY
+        entry = self.sentiment_index.query(key, buckets=buckets)
+        if entry is None:
+            return {"error": f"No indexed articles for {symbol or 'market'}"}
+        
+        return {
+            "status": "success",
+            "symbol": symbol.upper() if symbol else None,
+            # Same 0-100 mapping as get_enhanced_sentiment_data
+            "sentiment_score": int((entry["raw_sentiment"] + 1) * 50),
+            "half_life_seconds": self.sentiment_index.half_life,
+            "bucket_seconds": self.sentiment_index.bucket_size,
+            **entry
+        }
+    
+    def _parse_timestamp(self, timestamp) -> Optional[float]:
+        """Convert an ISO string or Unix timestamp to epoch seconds (None if unparseable)"""
+        if not timestamp:
+            return None
+        try:
+            if isinstance(timestamp, (int, float)):
+                return float(timestamp)
+            if isinstance(timestamp, str):
+                from datetime import timezone
+                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                return dt.timestamp()
+        except ValueError:
+            pass
+        return None
+    
     def _format_timestamp(self, timestamp) -> str:
         """Format timestamp to readable string"""
         if not timestamp:
@@ -258,20 +1227,37 @@ class YFinanceService:
         except:
             return "Recently"
     
+    def calculate_basic_sentiment_batch(self, texts: List[str]) -> List[float]:
+        """
+        Score a list of headlines in one regex pass over their concatenation;
+        each match is attributed to its headline by offset
+        """
+        lowered = [(text or "").lower() for text in texts]
+        starts = []
+        offset = 0
+        for text in lowered:
+            starts.append(offset)
+            # The newline separator is a word boundary, so no match spans two headlines
+            offset += len(text) + 1
+
+        matched = [set() for _ in lowered]
+        for match in SENTIMENT_PATTERN.finditer("\n".join(lowered)):
+            matched[bisect.bisect_right(starts, match.start()) - 1].add(match.group())
+        return [self._score_keywords(words) for words in matched]
+    
     def _calculate_basic_sentiment(self, text: str) -> float:
         """Calculate basic sentiment score for text"""
         if not text:
             return 0.0
         
-        # Simple sentiment analysis based on keywords
-        positive_words = ['gain', 'gains', 'up', 'rise', 'rises', 'bull', 'bullish', 'growth', 'profit', 'profits', 
-                         'increase', 'strong', 'buy', 'upgrade', 'outperform', 'beat', 'beats', 'positive', 'good']
-        negative_words = ['fall', 'falls', 'down', 'drop', 'drops', 'bear', 'bearish', 'loss', 'losses', 
-                         'decrease', 'weak', 'sell', 'downgrade', 'underperform', 'miss', 'misses', 'negative', 'bad']
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        # Each distinct keyword counts once, as whole words only
+        return self._score_keywords(set(SENTIMENT_PATTERN.findall(text.lower())))
+
+    @staticmethod
+    def _score_keywords(matched: set) -> float:
+        """Score from the distinct keywords found in one headline"""
+        positive_count = sum(1 for word in matched if SENTIMENT_POLARITY[word] > 0)
+        negative_count = len(matched) - positive_count
         
         if positive_count == negative_count:
             return 0.0
@@ -283,31 +1269,191 @@ class YFinanceService:
 # Create service instance
 yfinance_service = YFinanceService()
 
+def read_symbols(source: str) -> Iterator[str]:
+    """Symbols from "-" (stdin), a file (one per line) or a comma-separated list"""
+    if source == "-" or os.path.isfile(source):
+        stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                symbol = line.strip().upper()
+                if symbol and not symbol.startswith("#"):
+                    yield symbol
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    else:
+        for symbol in source.split(","):
+            if symbol.strip():
+                yield symbol.strip().upper()
+
+def parse_symbols(value: Any) -> List[str]:
+    """Symbols from a list or a comma-separated string"""
+    if isinstance(value, str):
+        value = value.split(",")
+    return [symbol.strip().upper() for symbol in value if symbol.strip()]
+
+def dispatch(service: YFinanceService, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Route a method name and its parameters to the service (shared by CLI and serve mode)"""
+    if method == "get_market_news":
+        return service.get_market_news(timeout=params.get("timeout"), since=params.get("since"))
+    elif method == "get_enhanced_sentiment_data":
+        return service.get_enhanced_sentiment_data()
+    elif method == "get_stock_news":
+        return service.get_stock_news(params.get("symbol") or "SPY", since=params.get("since"))
+    elif method == "get_sentiment_index":
+        return service.get_sentiment_index(params.get("symbol"), buckets=int(params.get("buckets", 24)))
+    elif method == "get_price_history":
+        symbols = parse_symbols(params.get("symbols") or params.get("symbol") or "SPY")
+        # cached: report what is already cached without downloading anything
+        return service.get_price_history(symbols, period=params.get("period", "1y"),
+                                         interval=params.get("interval", "1d"),
+                                         refresh=not params.get("cached", False))
+    elif method == "get_indicators":
+        symbols = parse_symbols(params.get("symbols") or params.get("symbol") or "SPY")
+        return service.get_indicators(symbols, interval=params.get("interval", "1d"))
+    elif method == "get_sentiment_correlation":
+        symbols = parse_symbols(params.get("symbols") or params.get("symbol") or "SPY")
+        horizons = params.get("horizons") or DEFAULT_HORIZONS
+        if isinstance(horizons, str):
+            horizons = [int(horizon) for horizon in horizons.split(",") if horizon.strip()]
+        return service.get_sentiment_correlation(symbols, interval=params.get("interval", "1d"),
+                                                 horizons=horizons, window=int(params.get("window", 60)))
+    elif method == "refresh_news":
+        symbols = parse_symbols(params.get("symbols") or params.get("symbol") or "SPY")
+        if len(symbols) == 1:
+            return service.refresh_ticker_news(symbols[0])
+        return service.refresh_ticker_news_many(symbols)
+    elif method == "get_stock_ticker_info":
+        return service.get_stock_ticker_info(params.get("symbol") or "AAPL")
+    return {"error": f"Unknown method: {method}"}
+
+class ServiceDaemon:
+    """
+    Long-running request loop around one YFinanceService. Requests arrive as
+    JSON lines ({"id", "method", "params"}) and run concurrently on a thread
+    pool; each response is written as one JSON line carrying the request id.
+    """
+    
+    def __init__(self, service: YFinanceService, max_workers: int = 8, stdin=None, stdout=None):
+        self.service = service
+        self.max_workers = max_workers
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self.write_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.started_at = time.time()
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0}
+        
+        # A long-lived process can refresh stale cache entries in-process
+        service.refresh_mode = "thread"
+    
+    def health(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return {
+            "status": "success",
+            "available": self.service.is_available(),
+            "import_error": self.service.import_error,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "max_workers": self.max_workers,
+            "news_cache": self.service.news_cache.get_stats() if self.service.news_cache else None,
+            **stats
+        }
+    
+    def _write(self, response: Dict[str, Any]):
+        line = json.dumps(response, default=str)
+        with self.write_lock:
+            self.stdout.write(line + "\n")
+            self.stdout.flush()
+    
+    def _handle(self, request_id: Any, method: str, params: Dict[str, Any]):
+        try:
+            result = dispatch(self.service, method, params)
+        except Exception as e:
+            result = {"error": f"Failed to execute {method}: {str(e)}"}
+        with self.stats_lock:
+            self.stats["in_flight"] -= 1
+            if result.get("error"):
+                self.stats["errors"] += 1
+        self._write({"id": request_id, **result})
+    
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        self._write({"event": "ready", "pid": os.getpid()})
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for line in self.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    self._write({"id": None, "error": f"Invalid request: {e}"})
+                    continue
+                
+                request_id = request.get("id")
+                method = request.get("method", "")
+                params = request.get("params") or {}
+                
+                with self.stats_lock:
+                    self.stats["requests"] += 1
+                if method == "health":
+                    self._write({"id": request_id, **self.health()})
+                    continue
+                
+                with self.stats_lock:
+                    self.stats["in_flight"] += 1
+                pool.submit(self._handle, request_id, method, params)
+
 # CLI interface for route calls
 if __name__ == "__main__":
-    import sys
-    import json
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No method specified"}))
         sys.exit(1)
     
     method = sys.argv[1]
+    # --since=<cursor> limits news methods to articles newer than a previous response's cursor
+    since = next((arg.split("=", 1)[1] for arg in sys.argv[2:] if arg.startswith("--since=")), None)
+    
+    if method == "scan_watchlist":
+        if len(sys.argv) < 3:
+            print(json.dumps({"error": "Symbols required: comma-separated list, file path or -"}))
+            sys.exit(1)
+        workers = int(os.environ.get("YFINANCE_SCAN_WORKERS", "8"))
+        rate = float(os.environ.get("YFINANCE_SCAN_RATE", "5"))
+        new_only = "--new-only" in sys.argv[3:]
+        for record in yfinance_service.scan_watchlist(read_symbols(sys.argv[2]), workers, rate, new_only, since):
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+        sys.exit(0)
+    
+    if method == "serve":
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else int(os.environ.get("YFINANCE_SERVE_WORKERS", "8"))
+        ServiceDaemon(yfinance_service, max_workers=workers).run()
+        sys.exit(0)
+    
+    args = [arg for arg in sys.argv[2:] if not arg.startswith("--since=") and arg != "--cached"]
+    params = {"symbol": args[0]} if args else {}
+    if since is not None:
+        params["since"] = since
+    if method == "get_price_history":
+        # get_price_history <SYM1,SYM2,...> [period] [interval] [--cached]
+        for key, value in zip(("period", "interval"), args[1:]):
+            params[key] = value
+        params["cached"] = "--cached" in sys.argv[2:]
+    elif method == "get_indicators" and len(args) > 1:
+        # get_indicators <SYM1,SYM2,...> [interval]
+        params["interval"] = args[1]
+    elif method == "get_sentiment_correlation":
+        # get_sentiment_correlation <SYM1,SYM2,...> [horizons e.g. 1,5,20] [interval]
+        for key, value in zip(("horizons", "interval"), args[1:]):
+            params[key] = value
     
     try:
-        if method == "get_market_news":
-            result = yfinance_service.get_market_news()
-        elif method == "get_enhanced_sentiment_data":
-            result = yfinance_service.get_enhanced_sentiment_data()
-        elif method == "get_stock_news":
-            symbol = sys.argv[2] if len(sys.argv) > 2 else "SPY"
-            result = yfinance_service.get_stock_news(symbol)
-        elif method == "get_stock_ticker_info":
-            symbol = sys.argv[2] if len(sys.argv) > 2 else "AAPL"
-            result = yfinance_service.get_stock_ticker_info(symbol)
-        else:
-            result = {"error": f"Unknown method: {method}"}
-        
+        result = dispatch(yfinance_service, method, params)
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Checks for Instagram request pacing and resumable feed paging, without network access"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server")
+os.environ.setdefault("INSTAGRAM_CACHE_DIR", tempfile.mkdtemp())
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+import pytest
+import requests
+from instagrapi import Client
+
+import instagram_service
+from instagram_store import SeenFilter
+
+
+class OfflineAdapter(requests.adapters.BaseAdapter):
+    """Answers every request with an empty JSON object"""
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.tokens = 0
+
+    def acquire(self):
+        self.tokens += 1
+
+
+def test_pace_requests_charges_every_session_of_a_real_client(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(instagram_service, "RATE_LIMITER", limiter)
+    cl = Client()
+    sessions = [session for session in (getattr(cl, name, None) for name in ("private", "public", "graphql"))
+                if session is not None]
+    for session in sessions:
+        session.mount("https://", OfflineAdapter())
+
+    instagram_service.pace_requests(cl)
+    for session in sessions:
+        session.get("https://www.instagram.com/")
+    assert limiter.tokens == len(sessions)
+    assert cl.request_timeout == 0
+
+
+class StubHashtagClient:
+    """
+    Hashtag feed behind instagrapi's chunk methods: the cursor is the pk of the
+    last media sent, and, like the public endpoint, the cursor passed in is
+    returned once there are no more pages
+    """
+
+    def __init__(self, pks, user_id=None):
+        self.pks = sorted(pks, reverse=True)
+        self.user_id = user_id
+        self.calls = []
+
+    def post(self, *pks):
+        self.pks = sorted(self.pks + list(pks), reverse=True)
+
+    def _chunk(self, max_amount, cursor):
+        older = [pk for pk in self.pks if cursor is None or pk < int(cursor)]
+        page = older[:max_amount]
+        more = len(older) > max_amount
+        return [SimpleNamespace(pk=str(pk)) for pk in page], str(page[-1]) if more else cursor
+
+    def hashtag_medias_a1_chunk(self, name, max_amount=27, tab_key="", end_cursor=None):
+        self.calls.append("a1")
+        return self._chunk(max_amount, end_cursor)
+
+    def hashtag_medias_v1_chunk(self, name, max_amount=27, tab_key="", max_id=None):
+        self.calls.append("v1")
+        medias, next_id = self._chunk(max_amount, max_id)
+        return medias, next_id if next_id != max_id else None
+
+
+@pytest.fixture
+def poll_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(instagram_service, "CACHE_DIR", str(tmp_path))
+    for name in ("_poll_state", "_user_ids", "_backfills"):
+        monkeypatch.setattr(instagram_service, name, None)
+
+
+def poll(cl, limit, page_size=2, max_pages=5):
+    medias, info = instagram_service.poll_new_medias(
+        "search_hashtag:stocks", instagram_service.hashtag_page("stocks", page_size), limit, max_pages, cl=cl)
+    return [int(media.pk) for media in medias], info
+
+
+def test_poll_ends_at_the_last_public_page(poll_state):
+    cl = StubHashtagClient(range(1, 6))
+    pks, info = poll(cl, limit=10)
+    assert pks == [5, 4, 3, 2, 1]
+    assert info == {"cursor": "5", "pages": 3, "backlog": False}
+    assert set(cl.calls) == {"a1"}
+    assert poll(cl, limit=10)[0] == []
+
+
+def test_poll_works_through_a_backlog_once(poll_state):
+    cl = StubHashtagClient(range(1, 11), user_id=1)
+    assert poll(cl, limit=3)[0] == [10, 9, 8]
+
+    cl.post(*range(11, 18))
+    delivered = []
+    for _ in range(4):
+        pks, info = poll(cl, limit=3)
+        delivered += pks
+        if not info["backlog"]:
+            break
+    assert delivered == list(range(17, 10, -1))
+    assert info["cursor"] == "17"
+    assert set(cl.calls) == {"v1"}
+    assert poll(cl, limit=3)[0] == []
+
+
+def test_seen_filter_ages_out_old_keys(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    seen = SeenFilter(path, capacity=100)
+    for i in range(300):
+        seen.add(f"feed:{i}")
+    # Two generations hold the latest 100-200 keys
+    assert all(f"feed:{i}" in seen for i in range(200, 300))
+    assert sum(f"feed:{i}" in seen for i in range(100)) < 5
+    assert "feed:299" in SeenFilter(path, capacity=100)
+
+
+class StubUserClient:
+    """A user's posts paged by offset, so new posts shift every later page"""
+
+    def __init__(self, pks):
+        self.pks = sorted(pks, reverse=True)
+
+    def post(self, *pks):
+        self.pks = sorted(self.pks + list(pks), reverse=True)
+
+    def user_id_from_username(self, username):
+        return "42"
+
+    def user_medias_paginated(self, user_id, amount=0, end_cursor=""):
+        offset = int(end_cursor or 0)
+        page = self.pks[offset:offset + amount]
+        medias = [SimpleNamespace(pk=str(pk), code=f"p{pk}", caption_text="", like_count=0, comment_count=0,
+                                  taken_at=None, media_type=1, thumbnail_url=None) for pk in page]
+        return medias, str(offset + amount) if offset + amount < len(self.pks) else ""
+
+
+def stream(username, **kwargs):
+    records = list(instagram_service.stream_user_posts(username, page_size=5, **kwargs))
+    return [int(record["id"]) for record in records[:-1]], records[-1]
+
+
+@pytest.mark.parametrize("new_posts", [3, 6])
+def test_backfill_resumes_after_last_post_when_pages_shift(poll_state, monkeypatch, new_posts):
+    cl = StubUserClient(range(1, 21))
+    monkeypatch.setattr(instagram_service, "_client", cl)
+
+    first, summary = stream("someone", limit=7)
+    assert first == list(range(20, 13, -1))
+    assert not summary["complete"]
+
+    # New posts push the last emitted one down, onto the next page when 6 arrive
+    cl.post(*range(21, 21 + new_posts))
+    rest, summary = stream("someone")
+    assert rest == list(range(13, 0, -1))
+    assert summary["complete"] and summary["total_emitted"] == 20
+
+    assert stream("someone")[0] == []
+    assert stream("someone", restart=True, limit=2)[0] == [20 + new_posts, 19 + new_posts]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
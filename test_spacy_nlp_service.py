@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Checks for the spaCy NLP worker protocol and scoring"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server"))
+os.environ.setdefault("SPACY_NLP_CACHE_SIZE", "0")
+
+import spacy_nlp_service
+
+
+def run_worker(*requests):
+    stdout = io.StringIO()
+    stdin = io.StringIO("".join(line + "\n" for line in requests))
+    spacy_nlp_service.serve(stdin=stdin, stdout=stdout)
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def test_worker_separates_bad_json_from_failed_requests(monkeypatch):
+    def reject(self, text, profile=spacy_nlp_service.DEFAULT_PROFILE):
+        raise ValueError("text is not analyzable")
+    monkeypatch.setattr(spacy_nlp_service.SpacyFinancialNLP, "analyze_text", reject)
+
+    bad_json, bad_request = run_worker("{not json", json.dumps({"id": 7, "text": "stocks rally"}))
+    assert bad_json["error"] == "invalid_json"
+    assert bad_request["error"] == "invalid_request"
+    assert bad_request["id"] == 7
+
+
+def test_phrase_scores_like_single_word(monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    from spacy.matcher import PhraseMatcher
+    # A blank pipeline is enough: phrase and lexicon scoring only need the tokenizer
+    monkeypatch.setattr(spacy_nlp_service, "nlp", spacy.blank("en"))
+    monkeypatch.setattr(spacy_nlp_service, "PhraseMatcher", PhraseMatcher, raising=False)
+    analyzer = spacy_nlp_service.SpacyFinancialNLP()
+
+    def score(text):
+        result = analyzer._analyze_doc(analyzer.nlp(text), text)
+        return result["analysis"]
+
+    phrase, word = score("up trend"), score("uptrend")
+    assert phrase["sentiment_score"] == word["sentiment_score"]
+    assert phrase["financial_context"]["market_direction_indicators"] == []
+    assert phrase["sentiment_features"]["neutral_count"] == 0
+
+
+def test_disk_cache_prunes_old_versions_and_oldest_rows():
+    path = os.path.join(tempfile.mkdtemp(), "analysis.db")
+    cache = spacy_nlp_service.AnalysisCache(max_entries=0, path=path, max_disk_entries=3)
+    for i in range(2):
+        cache.put(spacy_nlp_service.AnalysisCache.make_key(f"old {i}", "v1", "fast"), {"i": i})
+    current = [spacy_nlp_service.AnalysisCache.make_key(f"new {i}", "v2", "fast") for i in range(5)]
+    for i, key in enumerate(current):
+        cache.put(key, {"i": i})
+
+    assert cache.prune("v2") == 2
+    assert [cache.get(key) for key in current] == [None, None, {"i": 2}, {"i": 3}, {"i": 4}]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
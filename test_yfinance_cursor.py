@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Check that news cursors round-trip and resume exactly after the last article"""
+
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server")
+os.environ.setdefault("YFINANCE_CACHE_DIR", tempfile.mkdtemp())
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+import pytest
+
+from yfinance_service import Article, format_cursor, is_after_cursor, parse_cursor
+
+
+def article(n, published_at):
+    return Article(f"Story {n}", f"https://example.com/story/{n}", "Example", None, "SPY", published_at)
+
+
+def test_cursor_round_trips_exact_epoch():
+    for epoch in (1700000000.0, 1700000000.123456789, 0.1):
+        newest = article(1, epoch)
+        cursor = format_cursor([article(0, epoch - 1), newest])
+        assert parse_cursor(cursor) == (epoch, newest.id)
+        assert not is_after_cursor(newest, parse_cursor(cursor))
+
+
+def test_cursor_breaks_same_epoch_ties_by_id():
+    same_second = sorted((article(n, 1700000000.0) for n in range(6)), key=lambda a: a.id)
+    cursor = parse_cursor(format_cursor(same_second[:3]))
+    # Everything ordered after the cursor article, and nothing before it, is new
+    assert [is_after_cursor(a, cursor) for a in same_second] == [False] * 3 + [True] * 3
+
+
+def test_cursor_without_newer_articles_keeps_callers_cursor():
+    assert format_cursor([article(0, None)], "1700000000:yf_abc") == "1700000000:yf_abc"
+    assert format_cursor([]) is None
+
+
+def test_bare_epoch_cursor_and_bad_cursor():
+    cursor = parse_cursor("1700000000")
+    assert cursor == (1700000000.0, None)
+    assert not is_after_cursor(article(0, 1700000000.0), cursor)
+    assert is_after_cursor(article(1, 1700000001.0), cursor)
+    assert not is_after_cursor(article(2, None), cursor)
+    with pytest.raises(ValueError):
+        parse_cursor("yesterday")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Check that concurrent news ingests count every story exactly once"""
+
+import os
+import sys
+import tempfile
+import threading
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server")
+STORIES = 40
+SYMBOLS = ["AAPL", "MSFT", "NVDA"]
+WORKERS_PER_SYMBOL = 4
+
+
+def load_service_module(cache_dir):
+    """Import yfinance_service with its caches under cache_dir"""
+    os.environ["YFINANCE_CACHE_DIR"] = cache_dir
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+    sys.modules.pop("yfinance_service", None)
+    import yfinance_service
+    return yfinance_service
+
+
+def test_concurrent_ingest_counts_each_story_once():
+    module = load_service_module(tempfile.mkdtemp())
+    news = [{"content": {"title": f"Story {i} shares rise",
+                         "canonicalUrl": {"url": f"https://example.com/story/{i}"},
+                         "provider": {"displayName": "Example"},
+                         "pubDate": f"2024-01-01T00:{i:02d}:00Z"}} for i in range(STORIES)]
+
+    # One service per worker: separate SQLite connections, like separate processes
+    services = [module.YFinanceService() for _ in range(len(SYMBOLS) * WORKERS_PER_SYMBOL)]
+    new_counts = []
+    barrier = threading.Barrier(len(services))
+
+    def ingest(service, symbol):
+        articles = service._parse_articles(news, symbol)
+        barrier.wait()
+        indexed = service._index_articles(articles)
+        new_counts.append(sum(1 for article in indexed if article.is_new))
+
+    threads = [threading.Thread(target=ingest, args=(service, SYMBOLS[i % len(SYMBOLS)]))
+               for i, service in enumerate(services)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(new_counts) == STORIES
+    index = services[0].sentiment_index
+    assert index.query(module.MARKET_INDEX_KEY)["article_count"] == STORIES
+    for symbol in SYMBOLS:
+        assert index.query(symbol)["article_count"] == STORIES
+    assert len(services[0].article_index.observations(SYMBOLS)) == STORIES * len(SYMBOLS)
+
+
+def test_story_under_several_symbols_maps_to_each():
+    module = load_service_module(tempfile.mkdtemp())
+    story = [{"content": {"title": "Index funds rise on strong earnings",
+                          "canonicalUrl": {"url": "https://example.com/story/index"},
+                          "provider": {"displayName": "Example"},
+                          "pubDate": "2024-01-01T00:00:00Z"}}]
+    service = module.YFinanceService()
+    # One market-news call that carries the same story under two tickers
+    articles = service._parse_articles(story, "SPY") + service._parse_articles(story, "QQQ")
+
+    indexed = service._index_articles(articles)
+    assert len(indexed) == 1
+    assert sorted(row[0] for row in service.article_index.observations(["SPY", "QQQ"])) == ["QQQ", "SPY"]
+    assert service.sentiment_index.query("QQQ")["article_count"] == 1
+    assert service.sentiment_index.query(module.MARKET_INDEX_KEY)["article_count"] == 1
+
+
+def test_enhanced_sentiment_reads_the_index_once_filled():
+    module = load_service_module(tempfile.mkdtemp())
+    service = module.YFinanceService()
+    fetched = []
+
+    def upstream(symbol, limiter=None):
+        fetched.append(symbol)
+        return [{"content": {"title": f"{symbol} shares rise on strong earnings",
+                             "canonicalUrl": {"url": f"https://example.com/{symbol.lower()}"},
+                             "provider": {"displayName": "Example"},
+                             "pubDate": "2024-01-01T00:00:00Z"}}]
+    service._fetch_ticker_news_upstream = upstream
+
+    first = service.get_enhanced_sentiment_data()
+    assert first["status"] == "success" and fetched
+    fetched.clear()
+    second = service.get_enhanced_sentiment_data()
+    assert fetched == []
+    assert second["sentiment_score"] == first["sentiment_score"]
+    assert second["article_count"] == len(module.MARKET_NEWS_TICKERS)
+    assert len(second["latest_articles"]) == len(first["latest_articles"])
+
+
+if __name__ == "__main__":
+    test_concurrent_ingest_counts_each_story_once()
+    test_story_under_several_symbols_maps_to_each()
+    test_enhanced_sentiment_reads_the_index_once_filled()
+    print("✓ concurrent ingest counts each story once")
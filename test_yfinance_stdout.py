@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Check that the yfinance service writes nothing but JSON lines to stdout"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server", "yfinance_service.py")
+
+# Runs the service CLI with yfinance.Ticker replaced by an offline fake
+DRIVER = """
+import os, runpy, sys, time
+import yfinance
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    @property
+    def news(self):
+        if self.symbol == "FAIL":
+            raise RuntimeError("upstream unavailable")
+        return [{"content": {"title": f"{self.symbol} shares rise on strong earnings",
+                             "canonicalUrl": {"url": f"https://example.com/{self.symbol.lower()}"},
+                             "provider": {"displayName": "Example"},
+                             "pubDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}}]
+
+yfinance.Ticker = FakeTicker
+sys.argv = [sys.argv[1]] + sys.argv[2:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def run_service(*args, stdin=""):
+    env = dict(os.environ, YFINANCE_CACHE_DIR=tempfile.mkdtemp())
+    completed = subprocess.run(
+        [sys.executable, "-c", DRIVER, SERVICE, *args],
+        input=stdin, capture_output=True, text=True, timeout=60, env=env
+    )
+    return completed.stdout.splitlines()
+
+
+def assert_json_lines(lines):
+    assert lines, "no output on stdout"
+    for line in lines:
+        try:
+            json.loads(line)
+        except ValueError:
+            raise AssertionError(f"non-JSON line on stdout: {line!r}")
+
+
+def test_scan_watchlist_stdout_is_ndjson():
+    lines = run_service("scan_watchlist", "AAPL,MSFT,FAIL")
+    assert_json_lines(lines)
+    records = [json.loads(line) for line in lines]
+    assert sorted(record["symbol"] for record in records) == ["AAPL", "FAIL", "MSFT"]
+    assert all(record["articles"] for record in records if record["symbol"] != "FAIL")
+    # Failed symbols carry a cursor too, so a client can resume past them
+    assert all("cursor" in record for record in records)
+
+
+def test_serve_stdout_is_ndjson():
+    lines = run_service("serve", stdin=json.dumps({"id": 1, "method": "health"}) + "\n")
+    assert_json_lines(lines)
+    assert json.loads(lines[0])["event"] == "ready"
+
+
+if __name__ == "__main__":
+    test_scan_watchlist_stdout_is_ndjson()
+    test_serve_stdout_is_ndjson()
+    print("✓ yfinance service stdout is JSON only")